@@ -0,0 +1 @@
+../../shared/format_benchmark.py
\ No newline at end of file
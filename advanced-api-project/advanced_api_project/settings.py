@@ -38,11 +38,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',      # Add DRF
+    'rest_framework.authtoken',
     'django_filters',      # Add django-filter
     'api',                 # Add our app
 ]
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -52,7 +57,39 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Local memory by default; a FileBasedCache shares entries between worker
+# processes on one machine. Table versions (see api.versions) must be seen
+# by every process, so they get a shared cache of their own; use Redis or
+# Memcached when the processes run on more than one machine.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'versions',
+    },
+}
+API_VERSION_CACHE = 'versions'
+
+# Server-side cache of BookListView responses (see api.response_cache).
+# Set to None to turn it off.
+API_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 500,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'MAX_ENTRY_BYTES': 1024 * 1024,
+    # Fraction of hits that refresh their LRU position; the rest only read.
+    'RECENCY_SAMPLE': 0.1,
+    # Hits counted in the process before they are added to the shared counters.
+    'STATS_FLUSH_EVERY': 100,
+}
+
 MIDDLEWARE = [
+    # First, so its timings include the other middleware.
+    'advanced_api_project.request_metrics.RequestMetricsMiddleware',
+    'advanced_api_project.wire_formats.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +99,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Query counts and timings per request (see advanced_api_project.request_metrics).
+REQUEST_METRICS = {
+    'SERVER_TIMING': True,
+}
+
+# gzip/deflate for API responses whose client accepts them (see
+# advanced_api_project.wire_formats). Remove it to send every body as is.
+RESPONSE_COMPRESSION = {
+    'ENCODINGS': ['gzip', 'deflate'],
+    'LEVEL': 6,
+    'MIN_LENGTH': 1024,
+}
+
 ROOT_URLCONF = 'advanced_api_project.urls'
 
 TEMPLATES = [
@@ -92,6 +142,11 @@ DATABASES = {
     }
 }
 
+# Search backend behind ?search= on the book list (see api.search).
+# Picked from the database vendor when unset; run
+# `manage.py rebuild_search_index` after switching.
+# API_SEARCH_BACKEND = 'api.search.SQLiteSearchBackend'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
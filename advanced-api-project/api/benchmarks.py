@@ -0,0 +1,213 @@
+"""
+Endpoint benchmarks behind ``manage.py benchmark_endpoints``.
+
+Every case sends one kind of request through the full middleware stack
+with DRF's APIClient and records latency percentiles, SQL queries per
+request and the peak memory allocated while handling a request. Memory is
+traced on an extra request of its own, since tracemalloc slows down
+everything it watches. The garbage collector is off while requests are
+timed, so p99 does not depend on garbage left by the cases before.
+
+Results are plain dicts, so they can be written out as JSON and checked
+against a stored baseline with ``compare()``.
+"""
+import gc
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import urls
+from .models import Author, Book
+from .search import get_search_backend
+
+# Routes with no case, and why.
+SKIPPED_URLS = {
+    # Same names as the <int:pk> routes, without the pk the views need.
+    'books/update/': 'no pk in the URL',
+    'books/delete/': 'no pk in the URL',
+}
+
+# Metrics compare() gates on, with the difference below which they are
+# noise whatever the ratio. p99 is reported only: over a few dozen requests
+# it is the slowest one, which the scheduler decides as much as the code.
+MIN_DELTAS = {'p50_ms': 2.0, 'peak_kb': 64.0}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def seed(authors, books):
+    """Create ``authors`` authors sharing ``books`` books, and index them."""
+    authors = Author.objects.bulk_create(Author(name=f'Author {i}') for i in range(authors))
+    Book.objects.bulk_create(
+        Book(title=f'Book {i}', publication_year=1900 + i % 120, author=authors[i % len(authors)])
+        for i in range(books)
+    )
+    get_search_backend().rebuild()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class Case:
+    """
+    One kind of request. ``path`` and ``data`` are either fixed or
+    functions of the request number, for cases that must not repeat
+    themselves (e.g. deleting a different book each time).
+    """
+
+    def __init__(self, name, url_name, method, path, data=None, auth=False):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.auth = auth
+
+    def request(self, client, number):
+        path = self.path(number) if callable(self.path) else self.path
+        data = self.data(number) if callable(self.data) else self.data
+        response = getattr(client, self.method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise BenchmarkError(f'{self.name}: {self.method.upper()} {path} returned {response.status_code}.')
+        return response
+
+
+def build_cases(requests):
+    """
+    Cases for every route in api/urls.py except SKIPPED_URLS. Needs the
+    seeded data; creates the books the delete case consumes.
+    """
+    author = Author.objects.order_by('pk').first()
+    books = list(Book.objects.order_by('pk').values_list('pk', flat=True)[:100])
+    if author is None or not books:
+        raise BenchmarkError('Seed some authors and books first.')
+    doomed = Book.objects.bulk_create(
+        Book(title=f'Doomed {i}', publication_year=2000, author=author)
+        for i in range(requests + 2)
+    )
+    authors = list(Author.objects.order_by('pk').values_list('pk', flat=True)[:100])
+
+    def book(number):
+        return books[number % len(books)]
+
+    list_url = reverse('book-list')
+    return [
+        Case('book-list', 'book-list', 'get', list_url),
+        Case('book-list-deep-page', 'book-list', 'get', f'{list_url}?page={max(Book.objects.count() // 20, 1)}'),
+        Case('book-list-cursor', 'book-list', 'get', f'{list_url}?pagination=cursor'),
+        Case('book-list-filter', 'book-list', 'get', f'{list_url}?publication_year=1950'),
+        Case('book-list-search', 'book-list', 'get', f'{list_url}?search=book 12'),
+        Case('book-list-ordering', 'book-list', 'get', f'{list_url}?ordering=-publication_year'),
+        Case('book-detail', 'book-detail', 'get', lambda n: reverse('book-detail', args=[book(n)])),
+        Case('book-create', 'book-create', 'post', reverse('book-create'), auth=True, data=lambda n: {
+            'title': f'Created {n}', 'publication_year': 2000, 'author': author.pk,
+        }),
+        Case('book-update', 'book-update', 'put', lambda n: reverse('book-update', args=[book(n)]), auth=True,
+             data=lambda n: {'title': f'Updated {n}', 'publication_year': 2001, 'author': author.pk}),
+        Case('book-delete', 'book-delete', 'delete', lambda n: reverse('book-delete', args=[doomed[n].pk]), auth=True),
+        Case('book-bulk-update', 'book-bulk', 'patch', reverse('book-bulk'), auth=True, data=lambda n: [
+            {'id': pk, 'title': f'Bulk {n}'} for pk in books
+        ]),
+        Case('book-export', 'book-export', 'get', reverse('book-export')),
+        Case('book-export-ndjson', 'book-export', 'get', f'{reverse("book-export")}?format=ndjson'),
+        Case('author-list', 'author-list', 'get', reverse('author-list')),
+        Case('author-detail', 'author-detail', 'get',
+             lambda n: reverse('author-detail', args=[authors[n % len(authors)]])),
+        Case('author-export', 'author-export', 'get', reverse('author-export')),
+    ]
+
+
+def uncovered_urls(cases):
+    """Named routes in api/urls.py with no case and no entry in SKIPPED_URLS."""
+    covered = {case.url_name for case in cases}
+    return sorted(
+        str(pattern.pattern) for pattern in urls.urlpatterns
+        if pattern.name not in covered and str(pattern.pattern) not in SKIPPED_URLS
+    )
+
+
+def make_clients():
+    """Return an anonymous client and a client with a token."""
+    user, _ = User.objects.get_or_create(username='benchmark')
+    token, _ = Token.objects.get_or_create(user=user)
+    authenticated = APIClient()
+    authenticated.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return APIClient(), authenticated
+
+
+def run_case(case, client, requests):
+    """Return the metrics of ``requests`` timed requests, after one warm-up."""
+    case.request(client, 0)
+    timings, queries = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        for number in range(1, requests + 1):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                case.request(client, number)
+                timings.append(time.perf_counter() - started)
+            queries.append(len(captured))
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        case.request(client, requests + 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_cases(cases, requests):
+    """Run every case and return ``{case name: metrics}``."""
+    anonymous, authenticated = make_clients()
+    return {
+        case.name: run_case(case, authenticated if case.auth else anonymous, requests)
+        for case in cases
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a message for every metric in ``results`` that regressed past
+    ``baseline``: more queries than before, or median latency and peak
+    memory more than ``tolerance`` (a fraction) above it. Cases missing on
+    either side are ignored.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if metrics['queries'] > previous['queries']:
+            regressions.append(f'{name}: queries {previous["queries"]} -> {metrics["queries"]}')
+        for metric, min_delta in MIN_DELTAS.items():
+            old, new = previous[metric], metrics[metric]
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append(f'{name}: {metric} {old:g} -> {new:g}')
+    return regressions
@@ -0,0 +1,69 @@
+"""
+Streaming exports of whole tables.
+
+The export views read their rows with ``iterator(chunk_size=...)``,
+serialize one chunk at a time and hand the encoded chunks to a
+``StreamingHttpResponse``, so memory use depends on the chunk size, not on
+the table size. On PostgreSQL the iterator uses a server-side cursor; on
+SQLite rows are fetched from the open cursor in batches.
+
+Two encodings are offered: a single JSON array, byte for byte what an
+unpaginated list would return, and NDJSON, one object per line, which
+consumers can process as it arrives.
+"""
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def encode(item):
+    # Same options as DRF's JSONRenderer in its default compact mode.
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a list as one JSON document per line (other data as one line)."""
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(encode(item) + '\n' for item in items).encode()
+
+
+def iter_chunks(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_json(chunks):
+    yield b'['
+    separator = ''
+    for chunk in chunks:
+        if chunk:
+            yield (separator + ','.join(encode(item) for item in chunk)).encode()
+            separator = ','
+    yield b']'
+
+
+def stream_ndjson(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield ''.join(encode(item) + '\n' for item in chunk).encode()
+
+
+def streaming_export_response(chunks, format='json'):
+    """Stream lists of serialized items as a JSON array or as NDJSON."""
+    if format == NDJSONRenderer.format:
+        return StreamingHttpResponse(stream_ndjson(chunks), content_type=NDJSON_MEDIA_TYPE)
+    return StreamingHttpResponse(stream_json(chunks), content_type='application/json')
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import BenchmarkError, build_cases, compare, run_cases, seed, uncovered_urls
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure p50/p99 latency, queries per request and peak memory of every '
+        'api endpoint on a throwaway in-memory test database, and fail when a '
+        'metric regresses past the stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=30, help='Timed requests per case.')
+        parser.add_argument('--case', action='append', dest='cases', help='Only run this case (repeatable).')
+        parser.add_argument('--output', help='Write the results as JSON to this file ("-" for stdout).')
+        parser.add_argument(
+            '--baseline', default=str(DEFAULT_BASELINE),
+            help='Baseline JSON to compare with (default: %(default)s).',
+        )
+        parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with these results.')
+        parser.add_argument(
+            '--tolerance', type=float, default=1.0,
+            help='Allowed p50 latency and memory growth over the baseline, as a fraction. '
+                 'Queries per request may not grow at all.',
+        )
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Keep API_RESPONSE_CACHE on. By default it is off, so list cases measure the views.',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**({} if options['response_cache'] else {'API_RESPONSE_CACHE': None})):
+                results = self.run(options)
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'volumes': {'authors': options['authors'], 'books': options['books'], 'requests': options['requests']},
+            'database': connection.vendor,
+            'results': results,
+        }
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_table(results)
+            if options['output']:
+                Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stderr.write(f'Saved baseline to {baseline_path}.')
+            return
+        if not baseline_path.exists():
+            self.stderr.write(f'No baseline at {baseline_path}; run with --save-baseline to store one.')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['volumes'] != report['volumes']:
+            raise CommandError(
+                f'The baseline was measured with {baseline["volumes"]}; '
+                f'rerun with the same --authors/--books/--requests.'
+            )
+        regressions = compare(results, baseline['results'], options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stderr.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run(self, options):
+        seed(options['authors'], options['books'])
+        cases = build_cases(options['requests'])
+        missing = uncovered_urls(cases)
+        if missing:
+            raise CommandError(f'No benchmark case for: {", ".join(missing)}')
+        if options['cases']:
+            unknown = set(options['cases']) - {case.name for case in cases}
+            if unknown:
+                raise CommandError(f'Unknown cases: {", ".join(sorted(unknown))}')
+            cases = [case for case in cases if case.name in options['cases']]
+        return run_cases(cases, options['requests'])
+
+    def print_table(self, results):
+        self.stdout.write(f'{"case":<22} {"p50 ms":>9} {"p99 ms":>9} {"queries":>8} {"peak KB":>9}')
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<22} {metrics["p50_ms"]:9.2f} {metrics["p99_ms"]:9.2f} '
+                f'{metrics["queries"]:8d} {metrics["peak_kb"]:9.1f}'
+            )
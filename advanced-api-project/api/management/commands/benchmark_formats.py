@@ -0,0 +1,18 @@
+from advanced_api_project.format_benchmark import FormatBenchmarkCommand
+from api.models import Author, Book
+from api.serializers import BookSerializer
+
+
+class Command(FormatBenchmarkCommand):
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--authors', type=int, default=100)
+
+    def book_data(self, options):
+        authors = Author.objects.bulk_create(Author(name=f'Author {i}') for i in range(options['authors']))
+        Book.objects.bulk_create(
+            Book(title=f'Book {i}', publication_year=1900 + i % 120, author=authors[i % len(authors)])
+            for i in range(options['books'])
+        )
+        return BookSerializer.serialize_values(Book.objects.all())
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.models import Author, Book
+from api.serializers import AuthorSerializer, BookSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the ModelSerializer path and the .values_list() '
+        'fast path for books and authors, on a throwaway in-memory test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best one counts.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['books'], options['authors'])
+            cases = [
+                ('books', Book.objects.count(),
+                 lambda: BookSerializer(Book.objects.all(), many=True).data,
+                 lambda: BookSerializer.serialize_values(Book.objects.all())),
+                ('authors', Author.objects.count(),
+                 lambda: AuthorSerializer(AuthorSerializer.setup_eager_loading(Author.objects.all()), many=True).data,
+                 lambda: AuthorSerializer.serialize_values(Author.objects.all())),
+            ]
+            for label, rows, model_path, values_path in cases:
+                if model_path() != values_path():
+                    raise CommandError(f'{label}: the two paths produce different output.')
+                slow = self.best_of(model_path, options['repeat'])
+                fast = self.best_of(values_path, options['repeat'])
+                self.stdout.write(
+                    f'{label} ({rows} rows): ModelSerializer {rows / slow:10.0f} rows/s, '
+                    f'values_list {rows / fast:10.0f} rows/s, {slow / fast:.1f}x'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, books, authors):
+        authors = Author.objects.bulk_create(Author(name=f'Author {i}') for i in range(authors))
+        Book.objects.bulk_create(
+            Book(title=f'Book {i}', publication_year=1900 + i % 120, author=authors[i % len(authors)])
+            for i in range(books)
+        )
+
+    def best_of(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Book
+from api.search import get_search_backend
+from api.versions import bump_table_versions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index behind ?search= on the book list.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+        backend.rebuild()
+        # Search results may change, so drop cached lists and their ETags.
+        bump_table_versions(Book)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Book.objects.count()} books.'
+        ))
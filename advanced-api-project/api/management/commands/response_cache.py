@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.response_cache import get_response_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss metrics of the book list response cache, or clear it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Drop every cached response.')
+        parser.add_argument('--reset-stats', action='store_true', help='Zero the hit/miss counters.')
+
+    def handle(self, *args, **options):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            raise CommandError('API_RESPONSE_CACHE is not set.')
+
+        stats = response_cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / lookups if lookups else 0
+        self.stdout.write(
+            f"hits {stats['hits']}, misses {stats['misses']} ({ratio:.1%} hit rate), "
+            f"evictions {stats['evictions']}, {stats['entries']} entries, {stats['bytes']} bytes"
+        )
+        if options['clear']:
+            response_cache.clear()
+            self.stdout.write(self.style.SUCCESS('Cleared the response cache.'))
+        if options['reset_stats']:
+            response_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Reset the counters.'))
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE api_book_fts USING fts5("
+    "title, author, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO api_book_fts (rowid, title, author) "
+    "SELECT b.id, b.title, a.name FROM api_book b "
+    "JOIN api_author a ON a.id = b.author_id",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE api_book_search ("
+    "book_id bigint PRIMARY KEY REFERENCES api_book (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX api_book_search_document_idx ON api_book_search USING GIN (document)",
+    "INSERT INTO api_book_search (book_id, document) "
+    "SELECT b.id, setweight(to_tsvector('simple', b.title), 'A') || "
+    "setweight(to_tsvector('simple', a.name), 'B') "
+    "FROM api_book b JOIN api_author a ON a.id = b.author_id",
+]
+
+DROP = {
+    'sqlite': ["DROP TABLE IF EXISTS api_book_fts"],
+    'postgresql': ["DROP TABLE IF EXISTS api_book_search"],
+}
+
+CREATE = {
+    'sqlite': SQLITE_CREATE,
+    'postgresql': POSTGRES_CREATE,
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_book_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFTSEntry',
+            fields=[
+                ('book', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts_entry', serialize=False, to='api.book')),
+            ],
+            options={
+                'db_table': 'api_book_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='api.book')),
+            ],
+            options={
+                'db_table': 'api_book_search',
+                'managed': False,
+            },
+        ),
+    ]
@@ -7,11 +7,16 @@ class Author(models.Model):
     
     Fields:
         name (str): The full name of the author
+        updated_at (datetime): Last change to the author or any of their books
     
     Relationships:
         books (reverse ForeignKey): All books written by this author
     """
     name = models.CharField(max_length=200, help_text="Author's full name")
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the author or their books (used for ETags)"
+    )
     
     def __str__(self):
         return self.name
@@ -30,6 +35,7 @@ class Book(models.Model):
         title (str): The title of the book
         publication_year (int): Year the book was published
         author (ForeignKey): Reference to the Author who wrote this book
+        updated_at (datetime): Last change to the book
     
     Relationships:
         author (ForeignKey to Author): Many-to-one relationship
@@ -45,6 +51,10 @@ class Book(models.Model):
         related_name='books',
         help_text="Author of this book"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the book (used for ETags)"
+    )
     
     def __str__(self):
         return f"{self.title} ({self.publication_year})"
@@ -52,4 +62,28 @@ class Book(models.Model):
     class Meta:
         ordering = ['-publication_year', 'title']
         verbose_name = 'Book'
-        verbose_name_plural = 'Books'
\ No newline at end of file
+        verbose_name_plural = 'Books'
+
+class BookFTSEntry(models.Model):
+    """
+    A book's row in the SQLite FTS5 index (see api.search), keyed by rowid.
+    Only there so searches can join the index; it is written with raw SQL.
+    """
+    book = models.OneToOneField(
+        Book, models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fts_entry',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'api_book_fts'
+
+
+class BookSearchDocument(models.Model):
+    """A book's tsvector in the PostgreSQL index (see api.search)."""
+    book = models.OneToOneField(
+        Book, models.DO_NOTHING, primary_key=True, related_name='search_document',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'api_book_search'
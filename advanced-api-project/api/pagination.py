@@ -0,0 +1,177 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.query import ModelIterable
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination on the full ordering of the view, e.g. ``title`` or
+    ``-publication_year`` from OrderingFilter, with ``pk`` appended as the
+    tie-breaker.
+
+    DRF's CursorPagination only keys on the first ordering field and skips
+    ties with an OFFSET. Here the cursor holds the whole key of the last
+    row, and the next page is ``WHERE (title, pk) > (last title, last pk)``,
+    so every page costs the same and rows sharing a title are never skipped
+    or repeated. Ordering fields must not be nullable.
+
+    The total is reported as ``count``. It is cached for ``count_timeout``
+    seconds per filtered query (``count_mode = 'cached'``), counted on every
+    request (``'exact'``) or left out (``'none'``). Clients can skip it with
+    ``?count=0``.
+    """
+    ordering = 'pk'
+    count_query_param = 'count'
+    count_mode = 'cached'
+    count_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.request = request
+        self.opts = queryset.model._meta
+        self.ordering = self.get_key_ordering(queryset, request, view)
+        self.key_getter = self.get_key_getter(queryset)
+        reverse, key = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._reverse(field) for field in ordering)
+        page = queryset.order_by(*ordering)
+        if key is not None:
+            page = page.filter(self._after(ordering, key))
+        rows = list(page[:self.page_size + 1])
+
+        more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = more, True
+        else:
+            self.has_previous, self.has_next = key is not None, more
+
+        self.count = self.get_count(queryset, request)
+        return self.page
+
+    def get_key_ordering(self, queryset, request, view):
+        """The view's ordering with pk spelled out and appended if missing."""
+        pk_name = queryset.model._meta.pk.name
+        ordering = []
+        for field in self.get_ordering(request, queryset, view):
+            if not isinstance(field, str) or field.lstrip('-') in ('?', ''):
+                raise ImproperlyConfigured(f'Cannot paginate by cursor on {field!r}.')
+            name = field.lstrip('-')
+            prefix = '-' if field.startswith('-') else ''
+            ordering.append(prefix + (pk_name if name == 'pk' else name))
+        if not any(field.lstrip('-') == pk_name for field in ordering):
+            ordering.append(pk_name)
+        return tuple(ordering)
+
+    def get_key_getter(self, queryset):
+        """Return a function that reads the key from model instances or value rows."""
+        names = [field.lstrip('-') for field in self.ordering]
+        if issubclass(queryset._iterable_class, ModelIterable):
+            return lambda row: [getattr(row, name) for name in names]
+        fields = list(queryset._fields)
+        missing = [name for name in names if name not in fields]
+        if missing:
+            raise ImproperlyConfigured(f'values_list() rows lack the cursor fields {missing}.')
+        indexes = [fields.index(name) for name in names]
+        return lambda row: [row[index] for index in indexes]
+
+    def get_count(self, queryset, request):
+        mode = self.count_mode
+        if request.query_params.get(self.count_query_param) in ('0', 'false'):
+            mode = 'none'
+        if mode == 'none':
+            return None
+
+        queryset = queryset.order_by()
+        if mode == 'exact':
+            return queryset.count()
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params!r}'.encode(), usedforsecurity=False).hexdigest()
+        key = f'api:cursor-count:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    def _after(self, ordering, key):
+        """Build ``(a, b, c) > (x, y, z)`` for the given per-field directions."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, key):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _reverse(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def decode_cursor(self, request):
+        """Return ``(reverse, key)`` for the request's cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            state = json.loads(urlsafe_b64decode(padded.encode()))
+            if len(state['k']) != len(self.ordering):
+                raise ValueError(encoded)
+            key = [
+                self.opts.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, state['k'])
+            ]
+            return bool(state['r']), key
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, key):
+        state = {'r': int(reverse), 'k': key}
+        raw = json.dumps(state, cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.key_getter(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.key_getter(self.page[0]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'nullable': True,
+            'example': 123,
+        }
+        return response_schema
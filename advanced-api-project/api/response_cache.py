@@ -0,0 +1,198 @@
+"""
+Server-side cache for list responses.
+
+Entries are the serialized ``response.data`` of a list view, keyed on the
+host, the normalized query parameters and a generation. The generation is
+made of the table versions from api.versions, so any Book or Author write
+starts a new one. Entries from older generations are never read again and
+are dropped as soon as the next entry is stored.
+
+The cache keeps an index of its entries in LRU order, with their pickled
+sizes. The index enforces ``MAX_ENTRIES`` and ``MAX_BYTES`` the same way
+on every Django cache backend, including the local-memory and file-based
+ones, whose own culling knows nothing about entry sizes. The index lives
+in the cache too, so with several processes it is only approximately
+exact: updates that race may drop an entry from the index, which then
+simply expires after ``TIMEOUT``.
+
+A hit costs a single cache read. Only a ``RECENCY_SAMPLE`` fraction of
+hits moves its entry to the recent end of the index, which is enough to
+keep hot entries from being evicted. Hits are counted in the process and
+added to the shared counters on the next miss or every
+``STATS_FLUSH_EVERY`` hits, so ``stats()`` in another process can lag
+behind by that much.
+"""
+import hashlib
+import pickle
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = 'api:response-cache'
+COUNTERS = ('hits', 'misses', 'evictions')
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 500,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'MAX_ENTRY_BYTES': 1024 * 1024,
+    'RECENCY_SAMPLE': 0.1,
+    'STATS_FLUSH_EVERY': 100,
+}
+
+# Counts not yet added to the shared counters, per cache alias.
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def normalize_query(query_params):
+    """
+    Sort parameters by name and drop empty ones, so ``?a=1&b=`` and
+    ``?b=&a=1`` share an entry. Repeated values keep their order.
+    """
+    items = []
+    for name in sorted(query_params):
+        values = [value.strip() for value in query_params.getlist(name)]
+        items.extend((name, value) for value in values if value)
+    return urlencode(items)
+
+
+class ResponseCache:
+    def __init__(self, alias='default', timeout=300, max_entries=500,
+                 max_bytes=50 * 1024 * 1024, max_entry_bytes=1024 * 1024,
+                 recency_sample=0.1, stats_flush_every=100):
+        self.alias = alias
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.recency_sample = recency_sample
+        self.stats_flush_every = stats_flush_every
+
+    def make_key(self, request, generation):
+        raw = repr((request.get_host(), request.is_secure(), request.path,
+                    normalize_query(request.query_params), generation))
+        digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+        return f'{KEY_PREFIX}:{digest}'
+
+    def get(self, key):
+        data = self.cache.get(key)
+        if data is None:
+            index = self._load_index()
+            if index['entries'].pop(key, None) is not None:
+                # The backend expired or culled it on its own.
+                self._save_index(index)
+            self._count('misses')
+            return None
+        self._count('hits')
+        if random.random() < self.recency_sample:
+            index = self._load_index()
+            if key in index['entries']:
+                index['entries'][key] = index['entries'].pop(key)
+                self._save_index(index)
+        return data
+
+    def set(self, key, data, generation):
+        """Store ``data`` unless it is larger than ``max_entry_bytes``."""
+        size = len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_entry_bytes:
+            return False
+        index = self._load_index()
+        stale = []
+        if index['generation'] != generation:
+            stale = list(index['entries'])
+            index = {'generation': generation, 'entries': {}}
+        index['entries'].pop(key, None)
+        index['entries'][key] = size
+
+        evicted = []
+        entries = index['entries']
+        total = sum(entries.values())
+        while len(entries) > self.max_entries or total > self.max_bytes:
+            oldest = next(iter(entries))
+            total -= entries.pop(oldest)
+            evicted.append(oldest)
+        if stale or evicted:
+            self.cache.delete_many(stale + evicted)
+        if evicted:
+            self._count('evictions', len(evicted))
+        if key in entries:
+            self.cache.set(key, data, self.timeout)
+        self._save_index(index)
+        return key in entries
+
+    def clear(self):
+        index = self._load_index()
+        self.cache.delete_many(list(index['entries']) + [self._index_key()])
+
+    def stats(self):
+        """Shared counters plus this process's unflushed ones."""
+        counters = self.cache.get_many([self._counter_key(name) for name in COUNTERS])
+        with _pending_lock:
+            pending = Counter(_pending.get(self.alias, {}))
+        index = self._load_index()
+        return {
+            **{name: counters.get(self._counter_key(name), 0) + pending[name] for name in COUNTERS},
+            'entries': len(index['entries']),
+            'bytes': sum(index['entries'].values()),
+        }
+
+    def reset_stats(self):
+        with _pending_lock:
+            _pending.pop(self.alias, None)
+        self.cache.delete_many([self._counter_key(name) for name in COUNTERS])
+
+    def flush_stats(self):
+        """Add this process's counts to the shared counters."""
+        with _pending_lock:
+            pending = _pending.pop(self.alias, None)
+        for name, delta in (pending or {}).items():
+            key = self._counter_key(name)
+            self.cache.add(key, 0, None)
+            try:
+                self.cache.incr(key, delta)
+            except ValueError:
+                # Evicted between add() and incr().
+                self.cache.set(key, delta, None)
+
+    def _index_key(self):
+        return f'{KEY_PREFIX}:index'
+
+    def _counter_key(self, name):
+        return f'{KEY_PREFIX}:{name}'
+
+    def _load_index(self):
+        return self.cache.get(self._index_key()) or {'generation': None, 'entries': {}}
+
+    def _save_index(self, index):
+        self.cache.set(self._index_key(), index, None)
+
+    def _count(self, name, delta=1):
+        with _pending_lock:
+            pending = _pending.setdefault(self.alias, Counter())
+            pending[name] += delta
+            due = name != 'hits' or pending['hits'] >= self.stats_flush_every
+        if due:
+            self.flush_stats()
+
+
+def get_response_cache():
+    """Return the ``ResponseCache`` configured by API_RESPONSE_CACHE, or None."""
+    options = getattr(settings, 'API_RESPONSE_CACHE', None)
+    if not options:
+        return None
+    options = {**DEFAULTS, **options}
+    return ResponseCache(
+        alias=options['ALIAS'],
+        timeout=options['TIMEOUT'],
+        max_entries=options['MAX_ENTRIES'],
+        max_bytes=options['MAX_BYTES'],
+        max_entry_bytes=options['MAX_ENTRY_BYTES'],
+        recency_sample=options['RECENCY_SAMPLE'],
+        stats_flush_every=options['STATS_FLUSH_EVERY'],
+    )
@@ -0,0 +1,241 @@
+"""
+Indexed search for the book list.
+
+DRF's SearchFilter turns ``?search=`` into ``icontains`` over the title and
+a join to ``Author.name``, which no index can serve. The backends here keep
+an inverted index of each book's title and author name and filter a
+``Book`` queryset through it, with a ``search_rank`` alias (higher is
+better) to order by. The backend is picked from the ``API_SEARCH_BACKEND``
+setting, or from the database vendor when unset.
+
+Every word of the query must match the start of a word in the title or the
+author name, so ``?search=tolk hob`` finds "The Hobbit" by J.R.R. Tolkien.
+Unlike ``icontains``, a term no longer matches in the middle of a word.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.fields import BooleanField, FloatField
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .models import Book
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a raw query into word tokens, dropping any search syntax."""
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface shared by all search backends.
+
+    ``search()`` narrows a ``Book`` queryset, so filters, ordering and
+    pagination keep working on the result.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_books(self, book_ids):
+        """(Re)index the given books, removing ones that no longer exist."""
+
+    def remove_books(self, book_ids):
+        """Drop the given books from the index."""
+
+    def rebuild(self):
+        """Rebuild the whole index from the book and author tables."""
+
+    def get_documents(self, book_ids):
+        """Return ``(book_id, title, author_name)`` rows for indexing."""
+        return list(
+            Book.objects.filter(pk__in=book_ids).order_by()
+            .values_list('pk', 'title', 'author__name')
+        )
+
+    def _no_results(self, queryset):
+        return queryset.none().alias(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback backend with no index: substring matches on every request,
+    as SearchFilter does. Used on databases without a native full-text engine.
+    """
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return self._no_results(queryset)
+        for token in tokens:
+            queryset = queryset.filter(Q(title__icontains=token) | Q(author__name__icontains=token))
+        return queryset.alias(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 backend. The ``api_book_fts`` virtual table uses the book id as
+    its rowid, so results join straight back to ``api_book``.
+    """
+    table = 'api_book_fts'
+
+    def build_match(self, query):
+        # Quote every token and match it as a prefix; tokens are ANDed.
+        return ' '.join('"%s"*' % token for token in tokenize(query))
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return self._no_results(queryset)
+        # Join the index, so MATCH runs once and bm25() ranks the rows it
+        # found. (A correlated rank subquery re-runs MATCH for every book.)
+        # bm25() is lower-is-better, so negate it. Title hits weigh double.
+        match_sql = '"{table}"."{table}" MATCH %s'.format(table=self.table)
+        rank_sql = '-bm25("{table}", 2.0, 1.0)'.format(table=self.table)
+        return queryset.filter(
+            RawSQL(match_sql, (match,), output_field=BooleanField()),
+            fts_entry__isnull=False,
+        ).alias(
+            search_rank=RawSQL(rank_sql, (), output_field=FloatField()),
+        )
+
+    def index_books(self, book_ids):
+        book_ids = list(book_ids)
+        if not book_ids:
+            return
+        documents = self.get_documents(book_ids)
+        with connection.cursor() as cursor:
+            self._delete(cursor, book_ids)
+            cursor.executemany(
+                'INSERT INTO {table} (rowid, title, author) VALUES (%s, %s, %s)'.format(table=self.table),
+                documents,
+            )
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, book_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (rowid, title, author) '
+                'SELECT b.id, b.title, a.name FROM api_book b '
+                'JOIN api_author a ON a.id = b.author_id'.format(table=self.table)
+            )
+
+    def _delete(self, cursor, book_ids):
+        placeholders = ', '.join(['%s'] * len(book_ids))
+        cursor.execute(
+            'DELETE FROM {table} WHERE rowid IN ({placeholders})'.format(
+                table=self.table, placeholders=placeholders,
+            ),
+            book_ids,
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector backend. ``api_book_search`` holds one weighted document per
+    book (title A, author name B) behind a GIN index.
+    """
+    table = 'api_book_search'
+    config = 'simple'
+
+    def build_tsquery(self, query):
+        return ' & '.join('%s:*' % token for token in tokenize(query))
+
+    def search(self, queryset, query):
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return self._no_results(queryset)
+        # Join the index and rank the joined document, as the SQLite backend does.
+        match_sql = '"{table}"."document" @@ to_tsquery(%s, %s)'.format(table=self.table)
+        rank_sql = 'ts_rank("{table}"."document", to_tsquery(%s, %s))'.format(table=self.table)
+        return queryset.filter(
+            RawSQL(match_sql, (self.config, tsquery), output_field=BooleanField()),
+            search_document__isnull=False,
+        ).alias(
+            search_rank=RawSQL(rank_sql, (self.config, tsquery), output_field=FloatField()),
+        )
+
+    def index_books(self, book_ids):
+        book_ids = list(book_ids)
+        if not book_ids:
+            return
+        documents = self.get_documents(book_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {table} WHERE book_id = ANY(%s)'.format(table=self.table),
+                [book_ids],
+            )
+            cursor.executemany(
+                'INSERT INTO {table} (book_id, document) VALUES (%s, '
+                "setweight(to_tsvector(%s, %s), 'A') || "
+                "setweight(to_tsvector(%s, %s), 'B'))".format(table=self.table),
+                [
+                    (pk, self.config, title, self.config, author)
+                    for pk, title, author in documents
+                ],
+            )
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE book_id = ANY(%s)'.format(table=self.table),
+                    [book_ids],
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (book_id, document) '
+                "SELECT b.id, setweight(to_tsvector(%s, b.title), 'A') || "
+                "setweight(to_tsvector(%s, a.name), 'B') "
+                'FROM api_book b JOIN api_author a ON a.id = b.author_id'.format(table=self.table),
+                [self.config, self.config],
+            )
+
+
+BACKENDS = {
+    'sqlite': 'api.search.SQLiteSearchBackend',
+    'postgresql': 'api.search.PostgresSearchBackend',
+}
+
+
+def get_search_backend():
+    path = getattr(settings, 'API_SEARCH_BACKEND', None)
+    if not path:
+        path = BACKENDS.get(connection.vendor, 'api.search.DatabaseSearchBackend')
+    return import_string(path)()
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for SearchFilter that answers ``?search=`` from the
+    search index. Without an explicit ``?ordering=``, results come best
+    match first, then in the queryset's own order. Put it after
+    OrderingFilter in ``filter_backends`` so that order is kept.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        queryset = get_search_backend().search(queryset, ' '.join(terms))
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.order_by('-search_rank', *ordering)
+        return queryset
@@ -1,8 +1,190 @@
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Author, Book
 from datetime import datetime
 
-class BookSerializer(serializers.ModelSerializer):
+
+class EagerLoadingMixin:
+    """
+    Lets a serializer say which relations it reads, so views can load them
+    up front instead of once per object.
+
+    Nested serializers are found automatically: a many-valued one (such as
+    ``books`` on AuthorSerializer) becomes a ``Prefetch`` whose queryset is
+    set up by the nested serializer in turn, and a single one becomes a
+    ``select_related``. Relations read some other way, e.g. from a
+    SerializerMethodField, can be listed in ``select_related_fields`` and
+    ``prefetch_related_fields``.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Return ``queryset`` with everything this serializer reads loaded."""
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+
+        for field in cls().fields.values():
+            nested = getattr(field, 'child', field)
+            if not isinstance(nested, serializers.BaseSerializer) or field.source == '*':
+                continue
+            relation = queryset.model._meta.get_field(field.source)
+            if relation.many_to_many or relation.one_to_many:
+                related = relation.related_model._default_manager.all()
+                if isinstance(nested, EagerLoadingMixin):
+                    related = nested.setup_eager_loading(related)
+                queryset = queryset.prefetch_related(Prefetch(field.source, queryset=related))
+            else:
+                queryset = queryset.select_related(field.source)
+        return queryset
+
+
+class PrefetchedLookup:
+    """
+    Stands in for the queryset of a PrimaryKeyRelatedField when validating
+    many items: the related rows are loaded with one ``in_bulk()`` and
+    ``get(pk=...)`` answers from memory, with the same errors a queryset
+    would give.
+    """
+
+    def __init__(self, model, pks):
+        self.model = model
+        valid = set()
+        for pk in pks:
+            try:
+                valid.add(model._meta.pk.to_python(pk))
+            except (ValidationError, TypeError):
+                continue
+        self.objects = model._default_manager.in_bulk(valid)
+
+    def get(self, pk):
+        try:
+            key = self.model._meta.pk.to_python(pk)
+        except ValidationError as exc:
+            raise ValueError(pk) from exc
+        try:
+            return self.objects[key]
+        except (KeyError, TypeError):
+            raise self.model.DoesNotExist(pk)
+
+
+# Fields whose to_representation() returns database values unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.ManyRelatedField,
+    serializers.RelatedField,
+    serializers.SerializerMethodField,
+)
+
+
+class ValuesSerializerMixin:
+    """
+    Read-only fast path that serializes rows from ``.values_list()``
+    tuples instead of model instances.
+
+    The output matches ``to_representation()`` for plain model fields,
+    primary-key relations and many-valued nested serializers that use this
+    mixin too. The column plan is worked out once per class; serializers
+    with other kinds of fields raise ImproperlyConfigured.
+    """
+
+    @classmethod
+    def values_plan(cls):
+        """
+        Return ``(columns, nested)``: ``(name, column, convert)`` for each
+        flat field, and ``(name, relation, serializer class)`` for each
+        nested one. ``convert`` is None when values need no conversion.
+        """
+        if '_values_plan' not in cls.__dict__:
+            cls._values_plan = cls._build_values_plan()
+        return cls._values_plan
+
+    @classmethod
+    def _build_values_plan(cls):
+        opts = cls.Meta.model._meta
+        columns, nested = [], []
+        for name, field in cls().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(getattr(field, 'child', None), ValuesSerializerMixin):
+                relation = opts.get_field(field.source)
+                if not relation.one_to_many:
+                    raise ImproperlyConfigured(
+                        f'{cls.__name__}.{name}: only reverse foreign keys can be nested.'
+                    )
+                nested.append((name, relation, type(field.child)))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                columns.append((name, opts.get_field(field.source).attname, None))
+            elif isinstance(field, UNSUPPORTED_FIELDS) or '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(
+                    f'{cls.__name__}.{name} cannot be read from .values_list().'
+                )
+            else:
+                convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+                columns.append((name, field.source, convert))
+        return columns, nested
+
+    @classmethod
+    def values_queryset(cls, queryset, *extra):
+        """``queryset`` as the tuples ``serialize_rows()`` expects."""
+        columns, nested = cls.values_plan()
+        names = [column for _, column, _ in columns]
+        if nested:
+            names.append('pk')
+        return (
+            queryset.select_related(None).prefetch_related(None)
+            .values_list(*names, *extra)
+        )
+
+    @classmethod
+    def serialize_rows(cls, rows):
+        """Turn rows from ``values_queryset()`` into serialized dicts."""
+        columns, nested = cls.values_plan()
+        names = [name for name, _, _ in columns]
+        converters = [(index, convert) for index, (_, _, convert) in enumerate(columns) if convert]
+        data = []
+        for row in rows:
+            item = dict(zip(names, row))
+            for index, convert in converters:
+                if row[index] is not None:
+                    item[names[index]] = convert(row[index])
+            data.append(item)
+
+        if nested:
+            # Field order has to match the regular serializer.
+            order = list(cls().fields)
+            pks = [row[len(columns)] for row in rows]
+            for name, relation, serializer_class in nested:
+                fk = relation.field.attname
+                children = serializer_class.values_queryset(
+                    relation.related_model._default_manager.filter(**{f'{fk}__in': pks}), fk,
+                )
+                child_rows = list(children)
+                grouped = {}
+                for row, child in zip(child_rows, serializer_class.serialize_rows(child_rows)):
+                    grouped.setdefault(row[-1], []).append(child)
+                for pk, item in zip(pks, data):
+                    item[name] = grouped.get(pk, [])
+            data = [{name: item[name] for name in order if name in item} for item in data]
+        return data
+
+    @classmethod
+    def serialize_values(cls, queryset):
+        """Serialize every object in ``queryset`` without building instances."""
+        return cls.serialize_rows(cls.values_queryset(queryset))
+
+
+class BookSerializer(EagerLoadingMixin, ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Book model.
     
@@ -42,7 +224,7 @@ class BookSerializer(serializers.ModelSerializer):
         return value
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(EagerLoadingMixin, ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Author model with nested Book serialization.
     
@@ -54,6 +236,9 @@ class AuthorSerializer(serializers.ModelSerializer):
     The 'many=True' parameter indicates this is a list of books.
     The 'read_only=True' means books are only shown in GET requests,
     not accepted in POST/PUT requests.
+
+    Views that use EagerLoadingViewMixin prefetch the books for all authors
+    in one query, so a list of authors costs two queries, not one per author.
     
     Example JSON output:
     {
@@ -0,0 +1,90 @@
+"""
+Keep table versions and ``Author.updated_at`` in step with writes.
+
+An author's JSON nests their books, so any change to a book also touches
+its author (old and new, when a book moves), which keeps the author
+detail validator to a single column.
+
+Touched books are also reindexed for search (see api.search), and so
+are an author's books when the author is renamed.
+
+Bulk writes run inside ``deferred_versions()``, which collects the
+touched books and authors and handles them once at the end instead of
+once per row. ``bulk_create()`` and ``bulk_update()`` send no signals,
+so callers report their rows with ``touch_books()``.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Author, Book
+from .search import get_search_backend
+from .versions import bump_table_versions
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_versions():
+    """Batch the author touches, version bumps and reindexing of the writes inside."""
+    if getattr(_deferred, 'author_ids', None) is not None:
+        yield
+        return
+    _deferred.author_ids = set()
+    _deferred.book_ids = set()
+    try:
+        yield
+    finally:
+        author_ids, _deferred.author_ids = _deferred.author_ids, None
+        book_ids, _deferred.book_ids = _deferred.book_ids, None
+        get_search_backend().index_books(book_ids)
+        touch_authors(author_ids)
+
+
+def touch_books(books):
+    """Record writes to ``books`` that bypassed the model signals."""
+    author_ids = set()
+    for book in books:
+        author_ids.update((book.author_id, getattr(book, '_loaded_author_id', None)))
+        book._loaded_author_id = book.author_id
+    author_ids.discard(None)
+    book_ids = {book.pk for book in books if book.pk is not None}
+    if getattr(_deferred, 'author_ids', None) is not None:
+        _deferred.author_ids.update(author_ids)
+        _deferred.book_ids.update(book_ids)
+    else:
+        get_search_backend().index_books(book_ids)
+        touch_authors(author_ids)
+
+
+def touch_authors(author_ids):
+    if not author_ids:
+        return
+    Author.objects.filter(pk__in=author_ids).update(updated_at=timezone.now())
+    bump_table_versions(Book, Author)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def author_changed(sender, **kwargs):
+    bump_table_versions(Author)
+
+
+@receiver(post_save, sender=Author)
+def index_renamed_author(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        get_search_backend().index_books(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_init, sender=Book)
+def remember_book_author(sender, instance, **kwargs):
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    touch_books([instance])
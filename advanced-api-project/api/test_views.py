@@ -1,9 +1,31 @@
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
 from rest_framework.authtoken.models import Token
+from advanced_api_project.wire_formats import choose_encoding, packb, unpackb
+from advanced_api_project.request_metrics import RequestMetricsMiddleware, registry
+from .benchmarks import build_cases, compare, run_cases, seed, uncovered_urls
 from .models import Author, Book
+from .response_cache import ResponseCache, get_response_cache
+from .search import get_search_backend
+from .versions import check_version_cache
+from .views import AuthorExportView, AuthorListView, BookBulkView, BookListView
 from datetime import datetime
+from io import StringIO
+import gzip
+import json
+from unittest.mock import patch
+import shutil
+import tempfile
+import time
+import zlib
 
 class BookAPITestCase(APITestCase):
     """
@@ -336,6 +358,1008 @@ class AuthorAPITestCase(APITestCase):
         self.assertIn('title', first_book)
         self.assertIn('publication_year', first_book)
         self.assertIn('author', first_book)
+    
+    def test_list_authors_query_count(self):
+        """
+        Test GET /api/authors/ query count.
+        Books are prefetched for all authors at once, so the number of
+        queries must not grow with the number of authors.
+        """
+        for total in (5, 50):
+            for i in range(Author.objects.count(), total):
+                author = Author.objects.create(name=f"Author {i:03d}")
+                Book.objects.create(title=f"Book by {i}", publication_year=2000, author=author)
+            
+            # One query for the authors and one for all of their books
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/authors/')
+            
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), total)
+    
+    def test_author_detail_query_count(self):
+        """
+        Test GET /api/authors/<id>/ query count.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/authors/{self.author.id}/')
+        
+        # Books keep the model's default ordering (newest first)
+        self.assertEqual(
+            [book['title'] for book in response.data['books']],
+            ['Book 2', 'Book 1']
+        )
+
+
+@override_settings(API_RESPONSE_CACHE=None)
+class ValuesSerializationTestCase(APITestCase):
+    """
+    Tests for the .values_list() fast path of the list endpoints.
+    The JSON must be identical to what the ModelSerializer path returns.
+    """
+    
+    def setUp(self):
+        """
+        Set up authors with and without books.
+        """
+        self.author = Author.objects.create(name="Prolific Author")
+        self.other = Author.objects.create(name="Another Author")
+        Author.objects.create(name="No Books Yet")
+        for year in range(2000, 2015):
+            Book.objects.create(title=f"Book {year}", publication_year=year, author=self.author)
+        Book.objects.create(title="Solo Book", publication_year=1999, author=self.other)
+        
+        self.client = APIClient()
+    
+    def assertSameAsModelSerializer(self, view, url):
+        """
+        Compare the response body of both serialization modes.
+        """
+        fast = self.client.get(url)
+        with patch.object(view, 'values_serialization', False):
+            slow = self.client.get(url)
+        
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+    
+    def test_book_list_matches(self):
+        """
+        Test GET /api/books/ with pagination, filters, search and ordering.
+        """
+        for url in [
+            '/api/books/',
+            '/api/books/?page=2',
+            f'/api/books/?author={self.author.id}&ordering=-publication_year',
+            '/api/books/?search=solo',
+        ]:
+            with self.subTest(url=url):
+                self.assertSameAsModelSerializer(BookListView, url)
+    
+    def test_author_list_matches(self):
+        """
+        Test GET /api/authors/ including nested books.
+        """
+        self.assertSameAsModelSerializer(AuthorListView, '/api/authors/')
+    
+    def test_book_list_queries(self):
+        """
+        The fast path runs the same count and page queries.
+        """
+        with self.assertNumQueries(2):
+            self.client.get('/api/books/')
+
+
+class CursorPaginationTestCase(APITestCase):
+    """
+    Tests for GET /api/books/?pagination=cursor.
+    """
+    
+    def setUp(self):
+        """
+        Create 25 books where many share a title or a year,
+        so pages have to break ties on the primary key.
+        """
+        cache.clear()
+        self.author = Author.objects.create(name="Cursor Author")
+        for i in range(25):
+            Book.objects.create(
+                title=f"Title {i % 4}",
+                publication_year=2000 + i % 3,
+                author=self.author
+            )
+        
+        self.client = APIClient()
+    
+    def walk(self, url):
+        """
+        Follow the next links from url and return all pages.
+        """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+    
+    def test_pages_follow_ordering_with_pk_tie_breaker(self):
+        """
+        Every book appears once, ordered by the view's ordering and then pk.
+        """
+        for ordering, key in [
+            ('title', lambda book: (book.title, book.pk)),
+            ('-publication_year', lambda book: (-book.publication_year, book.pk)),
+            ('publication_year,-title', lambda book: (book.publication_year, -int(book.title.split()[1]), book.pk)),
+        ]:
+            with self.subTest(ordering=ordering):
+                pages = self.walk(f'/api/books/?pagination=cursor&ordering={ordering}')
+                ids = [book['id'] for page in pages for book in page['results']]
+                expected = [book.pk for book in sorted(Book.objects.all(), key=key)]
+                self.assertEqual(ids, expected)
+                self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+    
+    def test_previous_links(self):
+        """
+        Going back from the last page returns the earlier pages.
+        """
+        pages = self.walk('/api/books/?pagination=cursor')
+        self.assertIsNone(pages[0]['previous'])
+        
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+        self.assertIsNone(response.data['previous'])
+    
+    def test_filters_are_kept(self):
+        """
+        Links keep the filter parameters.
+        """
+        pages = self.walk('/api/books/?pagination=cursor&publication_year=2001')
+        self.assertEqual(sum(len(page['results']) for page in pages), 8)
+        self.assertEqual(pages[0]['count'], 8)
+    
+    def test_count_is_cached(self):
+        """
+        The count query runs once per filter combination, not per page.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/books/?pagination=cursor')
+        self.assertEqual(response.data['count'], 25)
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+    
+    def test_count_can_be_skipped(self):
+        """
+        ?count=0 leaves out the count query.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/books/?pagination=cursor&count=0')
+        self.assertIsNone(response.data['count'])
+    
+    def test_invalid_cursor(self):
+        """
+        A malformed cursor is a 404, as with DRF's CursorPagination.
+        """
+        response = self.client.get('/api/books/?pagination=cursor&cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_page_number_is_default(self):
+        """
+        Without ?pagination=cursor the API still uses page numbers.
+        """
+        response = self.client.get('/api/books/?page=3')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class ConditionalRequestTestCase(APITestCase):
+    """
+    Tests for ETag / Last-Modified on the book and author endpoints.
+    """
+    
+    def setUp(self):
+        """
+        Set up two authors, one book each, and a logged-in client for writes.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.author = Author.objects.create(name="First Author")
+        self.other = Author.objects.create(name="Second Author")
+        self.book = Book.objects.create(title="Cached Book", publication_year=2020, author=self.author)
+        Book.objects.create(title="Other Book", publication_year=2019, author=self.other)
+        
+        self.client = APIClient()
+    
+    def revalidate(self, url, response):
+        """
+        Repeat a GET with the validators from an earlier response.
+        """
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    
+    def test_book_list_not_modified(self):
+        """
+        An unchanged list is answered with 304 without touching the database.
+        """
+        response = self.client.get('/api/books/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        
+        with self.assertNumQueries(0):
+            cached = self.revalidate('/api/books/', response)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        
+        # Another page or filter is another representation
+        other = self.client.get('/api/books/?ordering=publication_year')
+        self.assertNotEqual(other['ETag'], response['ETag'])
+    
+    def test_book_list_changes_after_write(self):
+        """
+        Creating a book invalidates the list validators.
+        """
+        response = self.client.get('/api/books/')
+        self.client.login(username='testuser', password='testpass123')
+        self.client.post('/api/books/create/', {
+            'title': 'New Book', 'publication_year': 2021, 'author': self.author.id
+        })
+        
+        fresh = self.revalidate('/api/books/', response)
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(fresh.data['count'], 3)
+    
+    def test_book_detail_not_modified(self):
+        """
+        Book detail revalidation costs one small query, and updates change the ETag.
+        """
+        url = f'/api/books/{self.book.id}/'
+        response = self.client.get(url)
+        
+        with self.assertNumQueries(1):
+            cached = self.revalidate(url, response)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.book.title = "Renamed Book"
+        self.book.save()
+        fresh = self.revalidate(url, response)
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(fresh.data['title'], 'Renamed Book')
+    
+    def test_missing_book(self):
+        """
+        Conditional requests for a missing book still return 404.
+        """
+        response = self.client.get('/api/books/999/', HTTP_IF_NONE_MATCH='W/"abc"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_author_detail_follows_books(self):
+        """
+        Authors nest their books, so book changes change the author's ETag.
+        """
+        url = f'/api/authors/{self.author.id}/'
+        other_url = f'/api/authors/{self.other.id}/'
+        response = self.client.get(url)
+        other_response = self.client.get(other_url)
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        # Moving a book changes both authors
+        self.book.author = self.other
+        self.book.save()
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.revalidate(other_url, other_response).status_code, status.HTTP_200_OK)
+    
+    def test_author_list_not_modified(self):
+        """
+        The author list is invalidated by book deletes too.
+        """
+        response = self.client.get('/api/authors/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate('/api/authors/', response).status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.book.delete()
+        self.assertEqual(self.revalidate('/api/authors/', response).status_code, status.HTTP_200_OK)
+    
+    def test_versions_shared_between_processes(self):
+        """
+        A write seen through another process's cache handle still changes the ETag.
+        """
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                                       'versions': shared}):
+            response = self.client.get('/api/books/')
+            other_process = FileBasedCache(cache_dir, {})
+            other_process.set('api:table-version:api.book', 1, None)
+            self.assertEqual(self.revalidate('/api/books/', response).status_code, status.HTTP_200_OK)
+    
+    def test_version_cache_check(self):
+        """
+        A process-local version cache is reported by the system checks.
+        """
+        self.assertEqual(check_version_cache(None), [])
+        with override_settings(API_VERSION_CACHE='default'):
+            self.assertEqual([warning.id for warning in check_version_cache(None)], ['api.W001'])
+
+
+class ResponseCacheTestCase(APITestCase):
+    """
+    Tests for the server-side cache of GET /api/books/.
+    Runs on the local-memory cache; FileBasedResponseCacheTestCase
+    repeats it on the file-based one.
+    """
+    
+    def setUp(self):
+        """
+        Set up books and a user for writes.
+        """
+        cache.clear()
+        get_response_cache().reset_stats()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.author = Author.objects.create(name="Cache Author")
+        self.book = Book.objects.create(title="Cached Book", publication_year=2020, author=self.author)
+        Book.objects.create(title="Another Book", publication_year=2021, author=self.author)
+        
+        self.client = APIClient()
+    
+    def test_hit_after_miss(self):
+        """
+        The second identical request is served without queries.
+        """
+        response = self.client.get('/api/books/?ordering=title')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/books/?ordering=title')
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, response.data)
+        
+        stats = get_response_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+    
+    def test_query_parameters_are_normalized(self):
+        """
+        Parameter order and empty parameters do not split entries.
+        """
+        self.client.get('/api/books/?search=Book&ordering=-title')
+        response = self.client.get('/api/books/?ordering=-title&publication_year=&search=Book')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        
+        response = self.client.get('/api/books/?ordering=title&search=Book')
+        self.assertEqual(response['X-Cache'], 'MISS')
+    
+    def test_writes_start_a_new_generation(self):
+        """
+        Create, update and delete through the API invalidate cached lists.
+        """
+        self.client.login(username='testuser', password='testpass123')
+        writes = [
+            lambda: self.client.post('/api/books/create/', {
+                'title': 'New Book', 'publication_year': 2022, 'author': self.author.id
+            }),
+            lambda: self.client.patch(f'/api/books/{self.book.id}/update/', {'title': 'Renamed'}),
+            lambda: self.client.delete(f'/api/books/{self.book.id}/delete/'),
+        ]
+        for write in writes:
+            self.client.get('/api/books/')
+            self.assertEqual(self.client.get('/api/books/')['X-Cache'], 'HIT')
+            write()
+            response = self.client.get('/api/books/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.data['count'], Book.objects.count())
+        
+        # Entries of older generations are dropped
+        self.assertEqual(get_response_cache().stats()['entries'], 1)
+    
+    def test_lru_eviction(self):
+        """
+        With room for two entries, the least recently used one is evicted.
+        """
+        with self.settings(API_RESPONSE_CACHE={'MAX_ENTRIES': 2, 'RECENCY_SAMPLE': 1.0}):
+            self.client.get('/api/books/?page=1')
+            self.client.get('/api/books/?ordering=title')
+            self.client.get('/api/books/?page=1')
+            self.client.get('/api/books/?ordering=-title')
+            
+            self.assertEqual(self.client.get('/api/books/?page=1')['X-Cache'], 'HIT')
+            self.assertEqual(self.client.get('/api/books/?ordering=title')['X-Cache'], 'MISS')
+            self.assertGreaterEqual(get_response_cache().stats()['evictions'], 1)
+    
+    def test_hit_reads_once(self):
+        """
+        Unsampled hits read their entry and write nothing; counts reach the shared counters in batches.
+        """
+        with self.settings(API_RESPONSE_CACHE={'RECENCY_SAMPLE': 0, 'STATS_FLUSH_EVERY': 3}):
+            self.client.get('/api/books/')
+            response_cache = get_response_cache()
+            with patch.object(ResponseCache, '_load_index', side_effect=AssertionError), \
+                    patch.object(ResponseCache, 'flush_stats') as flush:
+                for _ in range(2):
+                    self.assertEqual(self.client.get('/api/books/')['X-Cache'], 'HIT')
+            flush.assert_not_called()
+            self.assertEqual(response_cache.stats()['hits'], 2)
+            self.client.get('/api/books/')
+            self.assertEqual(cache.get('api:response-cache:hits'), 3)
+    
+    def test_size_limits(self):
+        """
+        Oversized responses are not cached, and MAX_BYTES caps the total.
+        """
+        with self.settings(API_RESPONSE_CACHE={'MAX_ENTRY_BYTES': 10}):
+            self.client.get('/api/books/')
+            self.assertEqual(self.client.get('/api/books/')['X-Cache'], 'MISS')
+        
+        cache.clear()
+        with self.settings(API_RESPONSE_CACHE={'MAX_BYTES': 1500}):
+            for ordering in ('title', '-title', 'publication_year', '-publication_year'):
+                self.client.get(f'/api/books/?ordering={ordering}')
+            self.assertLessEqual(get_response_cache().stats()['bytes'], 1500)
+    
+    def test_stats_command(self):
+        """
+        The response_cache command reports the counters.
+        """
+        self.client.get('/api/books/')
+        self.client.get('/api/books/')
+        out = StringIO()
+        call_command('response_cache', '--clear', stdout=out)
+        self.assertIn('hits 1, misses 1 (50.0% hit rate)', out.getvalue())
+        self.assertEqual(get_response_cache().stats()['entries'], 0)
+
+
+class FileBasedResponseCacheTestCase(ResponseCacheTestCase):
+    """
+    The response cache tests on the file-based cache backend.
+    """
+    
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        file_cache = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cache_dir,
+            },
+            'versions': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        })
+        file_cache.enable()
+        self.addCleanup(file_cache.disable)
+        super().setUp()
+
+
+@override_settings(API_RESPONSE_CACHE=None)
+class StreamingExportTestCase(APITestCase):
+    """
+    Tests for the streaming exports at /api/books/export/ and /api/authors/export/.
+    """
+    
+    def setUp(self):
+        """
+        Set up three authors with two books each.
+        """
+        self.authors = [Author.objects.create(name=f"Author {i}") for i in range(3)]
+        for i, author in enumerate(self.authors):
+            Book.objects.create(title=f"Book {i}a", publication_year=2000 + i, author=author)
+            Book.objects.create(title=f"Book {i}b", publication_year=2010 + i, author=author)
+    
+    def export(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def test_json_matches_list(self):
+        """
+        The JSON export is the unpaginated list, filters and ordering included.
+        """
+        for query in ['', '?ordering=-publication_year', f'?author={self.authors[1].id}', '?search=book 2b']:
+            with self.subTest(query=query):
+                response, content = self.export('/api/books/export/' + query)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                listed = self.client.get('/api/books/' + query).data['results']
+                self.assertEqual(json.loads(content), json.loads(json.dumps(listed)))
+    
+    def test_ndjson(self):
+        """
+        NDJSON is chosen with ?format=ndjson or the Accept header.
+        """
+        _, content = self.export('/api/books/export/?format=ndjson')
+        lines = content.decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(json.loads(lines[0])['title'], 'Book 0a')
+        
+        response, accepted = self.export('/api/books/export/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(accepted, content)
+    
+    def test_authors_in_chunks(self):
+        """
+        Rows are read and serialized a chunk at a time, nested books included.
+        """
+        with patch.object(AuthorExportView, 'export_chunk_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                _, content = self.export('/api/authors/export/')
+        
+        authors = json.loads(content)
+        self.assertEqual([author['name'] for author in authors], ['Author 0', 'Author 1', 'Author 2'])
+        self.assertEqual([book['title'] for book in authors[2]['books']], ['Book 2b', 'Book 2a'])
+        # One author query, plus one book query per chunk of two authors
+        book_queries = [query for query in queries if 'FROM "api_book"' in query['sql']]
+        self.assertEqual(len(book_queries), 2)
+    
+    def test_empty(self):
+        """
+        An empty result is still valid JSON, and empty NDJSON.
+        """
+        _, content = self.export('/api/books/export/?publication_year=1900')
+        self.assertEqual(json.loads(content), [])
+        _, content = self.export('/api/books/export/?publication_year=1900&format=ndjson')
+        self.assertEqual(content, b'')
+    
+    def test_conditional_get(self):
+        """
+        Exports carry the list's validators and answer If-None-Match.
+        """
+        response, _ = self.export('/api/books/export/')
+        response = self.client.get('/api/books/export/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class BookSearchTestCase(APITestCase):
+    """
+    Tests for ?search= on /api/books/ through the search index.
+    """
+    
+    def setUp(self):
+        """
+        Set up books whose titles and authors share words.
+        """
+        cache.clear()
+        self.tolkien = Author.objects.create(name="J.R.R. Tolkien")
+        self.herbert = Author.objects.create(name="Frank Herbert")
+        self.hobbit = Book.objects.create(title="The Hobbit", publication_year=1937, author=self.tolkien)
+        self.rings = Book.objects.create(title="The Lord of the Rings", publication_year=1954, author=self.tolkien)
+        self.dune = Book.objects.create(title="Dune", publication_year=1965, author=self.herbert)
+        self.messiah = Book.objects.create(title="Dune Messiah", publication_year=1969, author=self.herbert)
+    
+    def search(self, query, **params):
+        response = self.client.get('/api/books/', {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+    
+    def test_prefix_terms_across_fields(self):
+        """
+        Every term must start a word of the title or the author name.
+        """
+        self.assertEqual(self.search('tolk hob'), ['The Hobbit'])
+        self.assertEqual(self.search('herb'), ['Dune', 'Dune Messiah'])
+        self.assertEqual(self.search('obbit'), [])
+        self.assertEqual(self.search('"dune*'), ['Dune', 'Dune Messiah'])
+    
+    def test_relevance_ordering(self):
+        """
+        Without ?ordering= the best match comes first; with it, the
+        requested ordering wins.
+        """
+        Book.objects.create(title="Rings", publication_year=2000, author=self.herbert)
+        self.assertEqual(self.search('rings'), ['Rings', 'The Lord of the Rings'])
+        self.assertEqual(self.search('rings', ordering='title'), ['Rings', 'The Lord of the Rings'])
+        self.assertEqual(self.search('rings', ordering='publication_year'), ['The Lord of the Rings', 'Rings'])
+    
+    def test_combines_with_filters(self):
+        """
+        Search narrows the filtered queryset.
+        """
+        self.assertEqual(self.search('dune', publication_year=1969), ['Dune Messiah'])
+    
+    def test_index_follows_writes(self):
+        """
+        Saves, renames and deletes are reflected in the index.
+        """
+        self.dune.title = "Children of Dune"
+        self.dune.save()
+        self.assertEqual(self.search('children'), ['Children of Dune'])
+        
+        self.herbert.name = "F. P. Herbert"
+        self.herbert.save()
+        self.assertEqual(self.search('frank'), [])
+        
+        self.messiah.delete()
+        self.assertEqual(self.search('dune'), ['Children of Dune'])
+    
+    def test_rebuild_command(self):
+        """
+        rebuild_search_index restores an index that fell out of step.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM api_book_fts')
+        self.assertEqual(self.search('dune'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('dune'), ['Dune', 'Dune Messiah'])
+
+    def test_match_runs_once_per_query(self):
+        """
+        The rank comes from the joined index row, not from a subquery that
+        repeats the full-text match for every book.
+        """
+        with CaptureQueriesContext(connection) as captured:
+            self.search('dune')
+        searches = [query['sql'] for query in captured if 'api_book_fts' in query['sql']]
+        self.assertTrue(searches)
+        for sql in searches:
+            self.assertEqual(sql.count('MATCH'), 1, sql)
+
+    def test_search_keeps_up_with_substring_scan(self):
+        """
+        A broad search over many books is not much slower than the
+        icontains scan the index replaced.
+        """
+        Book.objects.bulk_create(
+            Book(title=f'Book {i}', publication_year=1900 + i % 120, author=self.herbert)
+            for i in range(2000)
+        )
+        get_search_backend().rebuild()
+
+        def best_time(query):
+            timings = []
+            for _ in range(3):
+                get_response_cache().clear()
+                started = time.perf_counter()
+                self.search(query)
+                timings.append(time.perf_counter() - started)
+            return min(timings)
+
+        indexed = best_time('book')
+        with override_settings(API_SEARCH_BACKEND='api.search.DatabaseSearchBackend'):
+            scan = best_time('book')
+        # Generous: the per-book rank subquery was hundreds of times slower.
+        self.assertLess(indexed, scan * 3 + 0.02)
+
+
+class BookBulkAPITestCase(APITestCase):
+    """
+    Tests for POST/PUT/PATCH/DELETE /api/books/bulk/.
+    """
+    
+    def setUp(self):
+        """
+        Set up a user with a token, two authors and a book.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.author = Author.objects.create(name="Bulk Author")
+        self.other = Author.objects.create(name="Other Author")
+        self.book = Book.objects.create(title="Existing", publication_year=2000, author=self.author)
+        
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = '/api/books/bulk/'
+    
+    def test_create(self):
+        """
+        All valid items are created with a bounded number of queries.
+        """
+        items = [
+            {'title': f'Book {i}', 'publication_year': 1990 + i, 'author': self.author.id}
+            for i in range(30)
+        ]
+        # Token, author lookup, insert, reindex (3), author touch, plus savepoints
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, items, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual([result['index'] for result in response.data['results']], list(range(30)))
+        self.assertEqual(Book.objects.count(), 31)
+        self.assertEqual(Book.objects.get(pk=response.data['results'][5]['id']).title, 'Book 5')
+    
+    def test_create_reports_per_item_errors(self):
+        """
+        Invalid items are reported by index; the valid ones are still created.
+        """
+        future_year = datetime.now().year + 1
+        items = [
+            {'title': 'Good', 'publication_year': 2001, 'author': self.author.id},
+            {'title': 'Future', 'publication_year': future_year, 'author': self.author.id},
+            {'publication_year': 2001, 'author': self.author.id},
+            {'title': 'No Author', 'publication_year': 2001, 'author': 999},
+            'not an object',
+            {'title': 'Also Good', 'publication_year': 2002, 'author': self.other.id},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 5])
+        errors = {error['index']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4])
+        self.assertIn('future', str(errors[1]['publication_year'][0]))
+        self.assertIn('title', errors[2])
+        self.assertIn('author', errors[3])
+        self.assertIn('non_field_errors', errors[4])
+        self.assertEqual(Book.objects.count(), 3)
+    
+    def test_create_in_batches(self):
+        """
+        Items are written in chunks of batch_size.
+        """
+        items = [{'title': f'B{i}', 'publication_year': 2000, 'author': self.author.id} for i in range(5)]
+        with patch.object(BookBulkView, 'batch_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, items, format='json')
+        
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "api_book"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(len(response.data['results']), 5)
+    
+    def test_partial_update(self):
+        """
+        PATCH updates the given fields and reports missing or invalid items.
+        """
+        second = Book.objects.create(title="Second", publication_year=2001, author=self.author)
+        before = Author.objects.get(pk=self.other.pk).updated_at
+        items = [
+            {'id': self.book.id, 'title': 'Renamed'},
+            {'id': second.id, 'author': self.other.id},
+            {'id': 999, 'title': 'Missing'},
+            {'title': 'No id'},
+            {'id': self.book.id, 'publication_year': 500},
+        ]
+        response = self.client.patch(self.url, items, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 1])
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3, 4])
+        self.book.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((self.book.title, self.book.publication_year), ('Renamed', 2000))
+        self.assertEqual(second.author, self.other)
+        # The new author's nested books changed
+        self.assertGreater(Author.objects.get(pk=self.other.pk).updated_at, before)
+    
+    def test_full_update_requires_all_fields(self):
+        """
+        PUT validates each item as a complete book.
+        """
+        response = self.client.put(self.url, [{'id': self.book.id, 'title': 'Only Title'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('publication_year', response.data['errors'][0]['errors'])
+    
+    def test_delete(self):
+        """
+        DELETE removes the listed ids and reports unknown ones.
+        """
+        second = Book.objects.create(title="Second", publication_year=2001, author=self.author)
+        self.client.get('/api/books/')
+        response = self.client.delete(self.url, [self.book.id, 999, second.id, 'x'], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['id'] for result in response.data['results']], [self.book.id, second.id])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 3])
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(self.client.get('/api/books/')['X-Cache'], 'MISS')
+
+    def test_ids_must_be_integers(self):
+        """
+        Floats and booleans are invalid ids rather than rounded to a book;
+        integers given as digit strings are accepted.
+        """
+        ids = [1.5, True, float(self.book.id), str(self.book.id)]
+        response = self.client.delete(self.url, [1.5, True, float(self.book.id)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1, 2])
+        self.assertTrue(Book.objects.filter(pk=self.book.pk).exists())
+
+        items = [{'id': pk, 'title': 'Renamed'} for pk in ids]
+        response = self.client.patch(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1, 2])
+        self.assertEqual([result['index'] for result in response.data['results']], [3])
+
+        response = self.client.delete(self.url, [str(self.book.id)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Book.objects.exists())
+
+    def test_rejects_bad_requests(self):
+        """
+        Only lists are accepted, and only from authenticated users.
+        """
+        response = self.client.post(self.url, {'title': 'Not a list'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        self.client.credentials()
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(API_RESPONSE_CACHE=None)
+class EndpointBenchmarkTestCase(APITestCase):
+    """
+    Tests for the endpoint benchmarks behind benchmark_endpoints.
+    """
+    
+    def test_cases_cover_every_url(self):
+        """
+        Every route in api/urls.py has a case, and every case runs.
+        """
+        seed(authors=3, books=20)
+        cases = build_cases(requests=2)
+        self.assertEqual(uncovered_urls(cases), [])
+        
+        results = run_cases(cases, requests=2)
+        self.assertEqual(list(results), [case.name for case in cases])
+        self.assertEqual(results['book-detail']['queries'], 1)
+        self.assertGreater(results['author-list']['peak_kb'], 0)
+    
+    def test_compare(self):
+        """
+        Any extra query is a regression; median latency and memory only
+        past the tolerance and the noise floor. p99 is never one.
+        """
+        baseline = {'book-list': {'p50_ms': 4.0, 'p99_ms': 10.0, 'queries': 2, 'peak_kb': 100.0}}
+        same = {'book-list': {'p50_ms': 5.0, 'p99_ms': 12.0, 'queries': 2, 'peak_kb': 120.0}}
+        worse = {'book-list': {'p50_ms': 12.0, 'p99_ms': 12.0, 'queries': 3, 'peak_kb': 120.0}}
+        slow_tail = {'book-list': {'p50_ms': 4.0, 'p99_ms': 40.0, 'queries': 2, 'peak_kb': 100.0}}
+        
+        self.assertEqual(compare(same, baseline, tolerance=0.5), [])
+        self.assertEqual(compare(worse, baseline, tolerance=0.5), [
+            'book-list: queries 2 -> 3',
+            'book-list: p50_ms 4 -> 12',
+        ])
+        self.assertEqual(compare(worse, {}, tolerance=0.5), [])
+        self.assertEqual(compare(slow_tail, baseline, tolerance=0.5), [])
+
+
+@override_settings(API_RESPONSE_CACHE=None)
+class RequestMetricsTestCase(APITestCase):
+    """
+    Tests for the per-request metrics middleware and /_metrics/.
+    """
+    
+    def setUp(self):
+        """
+        Start from empty metrics with one book.
+        """
+        registry.reset()
+        self.author = Author.objects.create(name="Metrics Author")
+        Book.objects.create(title="Measured", publication_year=2000, author=self.author)
+    
+    def test_server_timing(self):
+        """
+        Responses carry query count, DB, render and total times.
+        """
+        response = self.client.get('/api/books/')
+        timing = response['Server-Timing']
+        self.assertIn('desc="2 queries, 0 duplicate"', timing)
+        self.assertRegex(timing, r'render;dur=[\d.]+, total;dur=[\d.]+$')
+    
+    def test_duplicate_queries(self):
+        """
+        Repeating a statement within one request counts as a duplicate.
+        """
+        def view(request):
+            for _ in range(3):
+                list(Book.objects.filter(pk=1))
+            return HttpResponse()
+        
+        response = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('desc="3 queries, 2 duplicate"', response['Server-Timing'])
+        self.assertEqual(registry.snapshot()['views']['<unresolved>']['duplicate_queries'], 2)
+    
+    def test_metrics_view(self):
+        """
+        Staff users get per-view histograms.
+        """
+        self.client.get('/api/books/')
+        self.client.get(f'/api/authors/{self.author.id}/')
+        self.assertEqual(self.client.get('/_metrics/').status_code, 403)
+        
+        User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.login(username='staff', password='testpass123')
+        views = self.client.get('/_metrics/').json()['views']
+        self.assertEqual(views['book-list']['requests'], 1)
+        self.assertEqual(views['book-list']['queries']['buckets']['le_2'], 1)
+        self.assertEqual(views['author-detail']['requests'], 1)
+
+
+class ResponseFormatTestCase(APITestCase):
+    """
+    Tests for the MessagePack renderer and response compression.
+    """
+    
+    def setUp(self):
+        """
+        Set up one author with a page of books.
+        """
+        author = Author.objects.create(name="Format Author")
+        Book.objects.bulk_create(
+            Book(title=f"Book {i}", publication_year=2000 + i, author=author) for i in range(10)
+        )
+    
+    def test_messagepack(self):
+        """
+        Accept: application/msgpack or ?format=msgpack returns the JSON data as MessagePack.
+        """
+        data = self.client.get('/api/books/').json()
+        response = self.client.get('/api/books/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(unpackb(response.content), data)
+        self.assertLess(len(response.content), len(json.dumps(data, separators=(',', ':'))))
+        response = self.client.get('/api/books/?format=msgpack')
+        self.assertEqual(unpackb(response.content), data)
+    
+    def test_packb_round_trip(self):
+        """
+        Every size class of every type survives packb() and unpackb().
+        """
+        values = [
+            0, 127, 128, 255, 256, 2 ** 16, 2 ** 32, 2 ** 64 - 1, -1, -32, -33, -129, -2 ** 15 - 1, -2 ** 63,
+            1.5, True, False, None, '', 'a' * 31, 'a' * 32, 'é' * 200, 'x' * 70000, b'bytes', b'x' * 300,
+            list(range(15)), list(range(16)), list(range(70000)), {str(i): i for i in range(16)},
+        ]
+        for value in values:
+            with self.subTest(value=repr(value)[:20]):
+                self.assertEqual(unpackb(packb(value)), value)
+        self.assertEqual(unpackb(packb({'day': datetime(2020, 1, 2).date()})), {'day': '2020-01-02'})
+        with self.assertRaises(ValueError):
+            unpackb(packb(1) + b'x')
+    
+    def test_choose_encoding(self):
+        """
+        Accept-Encoding is negotiated by q-value, then server preference.
+        """
+        encodings = ['gzip', 'deflate']
+        self.assertEqual(choose_encoding('gzip, deflate, br', encodings), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0.5, deflate', encodings), 'deflate')
+        self.assertEqual(choose_encoding('*', encodings), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, br', encodings))
+        self.assertIsNone(choose_encoding('identity, gzip;q=0.5', encodings))
+        self.assertIsNone(choose_encoding('', encodings))
+    
+    @override_settings(RESPONSE_COMPRESSION={'MIN_LENGTH': 100})
+    def test_compressed_list(self):
+        """
+        JSON and MessagePack bodies are compressed for clients that accept it.
+        """
+        plain = self.client.get('/api/books/')
+        response = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        
+        response = self.client.get('/api/books/?format=msgpack', HTTP_ACCEPT_ENCODING='deflate')
+        self.assertEqual(response['Content-Encoding'], 'deflate')
+        self.assertEqual(unpackb(zlib.decompress(response.content)), plain.json())
+    
+    def test_compressed_export(self):
+        """
+        Streaming exports are compressed chunk by chunk.
+        """
+        plain = b''.join(self.client.get('/api/books/export/').streaming_content)
+        with patch('api.views.BookExportView.export_chunk_size', 3):
+            response = self.client.get('/api/books/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+    
+    def test_not_compressed(self):
+        """
+        Small bodies, HTML and everything with the setting off are sent as is.
+        """
+        response = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.client.get('/api/books/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION=None):
+            response = self.client.get('/api/books/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
 
 
 class TestDatabaseIsolationTestCase(APITestCase):
@@ -5,8 +5,11 @@ from .views import (
     BookCreateView,
     BookUpdateView,
     BookDeleteView,
+    BookBulkView,
+    BookExportView,
     AuthorListView,
     AuthorDetailView,
+    AuthorExportView,
 )
 
 urlpatterns = [
@@ -16,10 +19,13 @@ urlpatterns = [
     path('books/create/', BookCreateView.as_view(), name='book-create'),
     path('books/<int:pk>/update/', BookUpdateView.as_view(), name='book-update'),
     path('books/<int:pk>/delete/', BookDeleteView.as_view(), name='book-delete'),
+    path('books/bulk/', BookBulkView.as_view(), name='book-bulk'),
+    path('books/export/', BookExportView.as_view(), name='book-export'),
     
     # Author endpoints
     path('authors/', AuthorListView.as_view(), name='author-list'),
     path('authors/<int:pk>/', AuthorDetailView.as_view(), name='author-detail'),
+    path('authors/export/', AuthorExportView.as_view(), name='author-export'),
 
     path('books/update/', BookUpdateView.as_view(), name='book-update'),
     path('books/delete/', BookDeleteView.as_view(), name='book-delete'),
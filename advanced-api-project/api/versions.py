@@ -0,0 +1,76 @@
+"""
+Cheap validators for conditional GETs.
+
+Each table has a version in the cache: the time, in nanoseconds, of the
+last write to it that went through the ORM. Signals bump it on every save
+and delete (see api.signals). Code that writes with ``update()`` or
+``bulk_create()`` must call ``bump_table_versions()`` itself. If the cache
+loses a version, a new one is started at the current time. Clients then
+refetch once, which is safe.
+
+Versions live in the cache named by the API_VERSION_CACHE setting, which
+every worker process must share: a write only bumps the versions in that
+cache, and a process-local one (LocMemCache) would keep answering 304 for
+data another process changed. ``check_version_cache`` warns about that.
+Versions also expire after ``VERSION_TIMEOUT`` seconds, which bounds how
+long such a cache can serve stale ones.
+
+Single rows are validated by their ``updated_at`` column.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = 'api:table-version:{}'
+VERSION_TIMEOUT = 300
+
+
+def get_version_cache():
+    return caches[getattr(settings, 'API_VERSION_CACHE', 'default')]
+
+
+def table_versions(*models):
+    """Return the current versions of ``models`` as a list of ints."""
+    cache = get_version_cache()
+    keys = [VERSION_KEY.format(model._meta.label_lower) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # add(), not set(): another process may have started one meanwhile.
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, VERSION_TIMEOUT)
+        found.update(cache.get_many(missing))
+        for key in missing:
+            found.setdefault(key, now)
+    return [found[key] for key in keys]
+
+
+def bump_table_versions(*models):
+    now = time.time_ns()
+    get_version_cache().set_many(
+        {VERSION_KEY.format(model._meta.label_lower): now for model in models},
+        VERSION_TIMEOUT,
+    )
+
+
+def version_datetime(version):
+    """The moment a table version was taken, for Last-Modified."""
+    return datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+
+
+@checks.register(checks.Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    if isinstance(get_version_cache(), LocMemCache):
+        return [checks.Warning(
+            'Table versions are kept in a LocMemCache, which each worker process has its own copy of.',
+            hint='Point API_VERSION_CACHE at a cache shared by every process, or run a single '
+                 'process; otherwise other processes answer 304 for up to '
+                 f'{VERSION_TIMEOUT} seconds after a write.',
+            id='api.W001',
+        )]
+    return []
@@ -1,23 +1,229 @@
-from rest_framework import generics, filters as drf_filters
+import hashlib
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import generics, filters as drf_filters, status
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from .models import Book
-from .serializers import BookSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from advanced_api_project.wire_formats import MessagePackRenderer
+from .export import NDJSONRenderer, iter_chunks, streaming_export_response
+from .models import Author, Book
+from .pagination import KeysetCursorPagination
+from .response_cache import get_response_cache
+from .search import IndexedSearchFilter
+from .serializers import AuthorSerializer, BookSerializer, PrefetchedLookup
+from .signals import deferred_versions, touch_books
+from .versions import table_versions, version_datetime
+
+
+class EagerLoadingViewMixin:
+    """
+    Applies the serializer's ``setup_eager_loading()`` to the view's
+    queryset, so nested relations are fetched in bulk, not per object.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+
+class ValuesListViewMixin:
+    """
+    Serves ``list()`` through the serializer's ``.values_list()`` fast path
+    (see ValuesSerializerMixin) while ``values_serialization`` is True.
+    Filtering, ordering and pagination work as usual; the JSON is the same.
+    """
+    values_serialization = True
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if not self.values_serialization or not hasattr(serializer_class, 'serialize_rows'):
+            return super().list(request, *args, **kwargs)
+
+        rows = serializer_class.values_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer_class.serialize_rows(page))
+        return Response(serializer_class.serialize_rows(rows))
+
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with 304 Not Modified before
+    the view runs its query. Subclasses return ``(etag, last_modified)``
+    from ``get_validators()``; None skips that validator.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        return None, None
+
+    def make_etag(self, request, *parts):
+        # The body also depends on the query string and the renderer.
+        key = repr((parts, request.get_full_path(), request.META.get('HTTP_ACCEPT', '')))
+        return 'W/"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if etag is None and timestamp is None:
+                # Detail views can read them from the object they loaded.
+                etag, last_modified = self.get_validators(request, *args, **kwargs)
+                timestamp = int(last_modified.timestamp()) if last_modified else None
+        if etag:
+            response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class TableVersionMixin(ConditionalGetMixin):
+    """Validators from the table versions of ``version_models``."""
+    version_models = ()
+
+    def get_validators(self, request, *args, **kwargs):
+        versions = table_versions(*self.version_models)
+        return self.make_etag(request, versions), version_datetime(max(versions))
+
+
+class RowVersionMixin(ConditionalGetMixin):
+    """
+    Validators from the ``updated_at`` column of the requested row. Only
+    conditional requests look it up before the view runs; the others take
+    it from the object the view loads anyway.
+    """
+
+    def get_object(self):
+        obj = super().get_object()
+        self.loaded_updated_at = obj.updated_at
+        return obj
+
+    def get_validators(self, request, *args, **kwargs):
+        updated_at = getattr(self, 'loaded_updated_at', None)
+        if updated_at is None:
+            if not any(header in request.META for header in CONDITIONAL_HEADERS):
+                return None, None
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            updated_at = (
+                self.queryset.filter(**{self.lookup_field: kwargs[lookup]})
+                .values_list('updated_at', flat=True).first()
+            )
+            if updated_at is None:
+                return None, None
+        return self.make_etag(request, updated_at.isoformat()), updated_at
+
+
+class ResponseCacheMixin:
+    """
+    Serves ``list()`` from the server-side response cache (see
+    api.response_cache) when API_RESPONSE_CACHE is set. Entries are
+    invalidated by the table versions of ``version_models``. Responses
+    carry ``X-Cache: HIT`` or ``MISS``.
+    """
+    version_models = ()
+
+    def list(self, request, *args, **kwargs):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return super().list(request, *args, **kwargs)
+
+        generation = table_versions(*self.version_models)
+        key = response_cache.make_key(request, generation)
+        data = response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(key, response.data, generation)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class PaginationModeMixin:
+    """
+    Lets clients pick a paginator with ``?pagination=<mode>``, e.g.
+    ``?pagination=cursor``. Without it the default pagination_class is used.
+    """
+    pagination_modes = {}
+    pagination_mode_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get(self.pagination_mode_param)
+            pagination_class = self.pagination_modes.get(mode, self.pagination_class)
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
+
+
+class StreamingExportMixin:
+    """
+    Streams every row of the filtered, ordered queryset instead of a page
+    (see api.export): a JSON array by default, NDJSON with ``?format=ndjson``
+    or ``Accept: application/x-ndjson``. Rows are read and serialized
+    ``export_chunk_size`` at a time through the serializer's values path.
+    """
+    export_chunk_size = 2000
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+    pagination_class = None
+    pagination_modes = {}
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        rows = serializer_class.values_queryset(self.filter_queryset(self.get_queryset()))
+        rows = rows.iterator(chunk_size=self.export_chunk_size)
+        chunks = (
+            serializer_class.serialize_rows(chunk)
+            for chunk in iter_chunks(rows, self.export_chunk_size)
+        )
+        return streaming_export_response(chunks, request.accepted_renderer.format)
+
 
 # List all books with filtering, searching, ordering
-class BookListView(generics.ListAPIView):
+class BookListView(TableVersionMixin, ResponseCacheMixin, PaginationModeMixin, ValuesListViewMixin, EagerLoadingViewMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # Search looks at author names too
+    version_models = [Book, Author]
+    # ?pagination=cursor pages by (ordering, pk) without OFFSET
+    pagination_modes = {'cursor': KeysetCursorPagination}
+    # Accept: application/msgpack for a smaller binary body
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
 
-    filter_backends = [filters.DjangoFilterBackend, drf_filters.SearchFilter, drf_filters.OrderingFilter]
+    # ?search= goes through the search index and ranks by relevance
+    filter_backends = [filters.DjangoFilterBackend, drf_filters.OrderingFilter, IndexedSearchFilter]
     filterset_fields = ['title', 'author', 'publication_year']
-    search_fields = ['title', 'author']
+    search_fields = ['title', 'author__name']
     ordering_fields = ['title', 'publication_year']
     ordering = ['title']
 
+# Stream the whole (filtered) book list, e.g. for downstream jobs
+class BookExportView(StreamingExportMixin, BookListView):
+    pass
+
 # Retrieve a single book
-class BookDetailView(generics.RetrieveAPIView):
+class BookDetailView(RowVersionMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -45,3 +251,162 @@ class BookDeleteView(generics.DestroyAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticated]
+
+
+# Create, update or delete many books per request (authenticated users only)
+class BookBulkView(APIView):
+    """
+    POST a list of books to create them, PUT or PATCH a list of books with
+    ``id`` to update them, or DELETE a list of ids.
+
+    Every item is validated with BookSerializer, including
+    ``validate_publication_year``. Invalid items are reported by their
+    position in the list and do not stop the others from being written.
+    Valid items are written ``batch_size`` at a time with one
+    ``bulk_create`` / ``bulk_update`` / ``delete`` each.
+
+    Responds 201/200 when every item was written, 207 when only some
+    were, and 400 when none were.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = BookSerializer
+    batch_size = 1000
+    max_items = 10000
+
+    def post(self, request):
+        return self.run(request, self.create_batch, status.HTTP_201_CREATED)
+
+    def put(self, request):
+        return self.run(request, self.update_batch, status.HTTP_200_OK)
+
+    def patch(self, request):
+        return self.run(request, self.update_batch, status.HTTP_200_OK, partial=True)
+
+    def delete(self, request):
+        return self.run(request, self.delete_batch, status.HTTP_200_OK)
+
+    def run(self, request, write_batch, success_status, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if len(items) > self.max_items:
+            raise ValidationError({'detail': f'At most {self.max_items} items per request.'})
+
+        results, errors = [], []
+        with deferred_versions():
+            for start in range(0, len(items), self.batch_size):
+                batch = list(enumerate(items[start:start + self.batch_size], start))
+                with transaction.atomic():
+                    done, failed = write_batch(batch, **kwargs)
+                results.extend(done)
+                errors.extend(failed)
+
+        if errors and not results:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = success_status
+        return Response({'results': results, 'errors': errors}, status=response_status)
+
+    def get_bulk_serializer(self, authors, **kwargs):
+        serializer = self.serializer_class(context={'request': self.request, 'view': self}, **kwargs)
+        serializer.fields['author'].queryset = PrefetchedLookup(Author, authors)
+        return serializer
+
+    def validate_batch(self, serializer, batch):
+        valid, errors = [], []
+        for index, item in batch:
+            try:
+                valid.append((index, serializer.run_validation(item)))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+        return valid, errors
+
+    def create_batch(self, batch):
+        authors = [item.get('author') for _, item in batch if isinstance(item, dict)]
+        valid, errors = self.validate_batch(self.get_bulk_serializer(authors), batch)
+        books = Book.objects.bulk_create([Book(**data) for _, data in valid])
+        touch_books(books)
+        results = [{'index': index, 'id': book.pk} for (index, _), book in zip(valid, books)]
+        return results, errors
+
+    def update_batch(self, batch, partial=False):
+        ids, errors = self.parse_ids(batch, lambda item: item.get('id') if isinstance(item, dict) else None)
+        books = Book.objects.select_for_update().in_bulk(set(ids.values()))
+        found = []
+        for index, item in batch:
+            if index not in ids:
+                continue
+            if ids[index] in books:
+                found.append((index, item))
+            else:
+                errors.append({'index': index, 'errors': {'id': ['Book not found.']}})
+
+        authors = [item.get('author') for _, item in found]
+        valid, invalid = self.validate_batch(self.get_bulk_serializer(authors, partial=partial), found)
+        errors.extend(invalid)
+
+        # bulk_update() skips auto_now, so updated_at is set here.
+        changed, fields = [], {'updated_at'}
+        now = timezone.now()
+        for index, data in valid:
+            book = books[ids[index]]
+            for name, value in data.items():
+                setattr(book, name, value)
+            book.updated_at = now
+            fields.update(data)
+            changed.append(book)
+        Book.objects.bulk_update(changed, sorted(fields))
+        touch_books(changed)
+        results = [{'index': index, 'id': ids[index]} for index, _ in valid]
+        return results, sorted(errors, key=lambda error: error['index'])
+
+    def delete_batch(self, batch):
+        ids, errors = self.parse_ids(batch, lambda item: item)
+        existing = set(Book.objects.filter(pk__in=ids.values()).values_list('pk', flat=True))
+        results = []
+        for index, pk in ids.items():
+            if pk in existing:
+                results.append({'index': index, 'id': pk})
+                existing.discard(pk)
+            else:
+                errors.append({'index': index, 'errors': {'id': ['Book not found.']}})
+        Book.objects.filter(pk__in=[result['id'] for result in results]).delete()
+        return results, sorted(errors, key=lambda error: error['index'])
+
+    def parse_ids(self, batch, get_id):
+        """Return ``{index: pk}`` for the items of ``batch`` and errors for bad ids."""
+        ids, errors = {}, []
+        for index, item in batch:
+            pk = get_id(item)
+            # Only integers and strings of digits: to_python() would turn 1.5
+            # and true into 1 and act on a book nobody asked for.
+            if isinstance(pk, str) and pk.isascii() and pk.isdigit():
+                pk = int(pk)
+            if type(pk) is not int:
+                errors.append({'index': index, 'errors': {'id': ['A valid integer is required.']}})
+            else:
+                ids[index] = pk
+        return ids, errors
+
+
+# List all authors with their books nested
+class AuthorListView(TableVersionMixin, ValuesListViewMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Author.objects.all()
+    serializer_class = AuthorSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    version_models = [Book, Author]
+    pagination_class = None
+
+
+# Stream every author with their books nested
+class AuthorExportView(StreamingExportMixin, AuthorListView):
+    pass
+
+
+# Retrieve a single author with their books nested
+class AuthorDetailView(RowVersionMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
+    queryset = Author.objects.all()
+    serializer_class = AuthorSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
@@ -0,0 +1 @@
+../../../shared/request_metrics.py
\ No newline at end of file
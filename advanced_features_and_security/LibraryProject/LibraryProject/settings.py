@@ -68,6 +68,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings include the other middleware.
+    'LibraryProject.request_metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +79,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Query counts and timings per request (see LibraryProject.request_metrics).
+REQUEST_METRICS = {
+    'SERVER_TIMING': True,
+}
+
 ROOT_URLCONF = 'django_models.urls'
 
 TEMPLATES = [
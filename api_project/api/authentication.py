@@ -0,0 +1,143 @@
+"""
+Token authentication that skips the database for known tokens.
+
+DRF's TokenAuthentication looks the key up in ``authtoken_token`` joined to
+``auth_user`` on every request. ``CachedTokenAuthentication`` keeps the
+resolved token, with its user, in a small in-process LRU for up to
+``TIMEOUT`` seconds. After that the token is read again, which also
+re-checks that the user is still active.
+
+Revocations go through the shared Django cache (``ALIAS``). Saving or
+deleting a token, or saving or deleting its user (e.g. to deactivate them),
+stores a tombstone for the token there (see api.signals), and every cache
+hit, in every process, checks for one before the cached token is used. A
+tombstone lives as long as a cached token can, so each change takes
+effect at once everywhere. Only the tombstone marker is stored in the
+shared cache, never the token or the user.
+
+That only works if the cache really is shared by every worker process. When
+``ALIAS`` names a process-local backend (LocMemCache or DummyCache), nothing
+is cached and every request reads the token from the database, as
+TokenAuthentication does; ``check_token_cache`` warns about it.
+
+Cache keys are hashes of the token keys, never the keys themselves.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+
+KEY_PREFIX = 'api:token-auth'
+TOMBSTONE = 'invalidated'
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'MAX_ENTRIES': 1024,
+}
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+def get_shared_cache():
+    """The cache that holds tombstones, or None when it is not shared."""
+    cache = caches[get_options()['ALIAS']]
+    return None if isinstance(cache, PROCESS_LOCAL_BACKENDS) else cache
+
+
+def cache_key(key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{digest}'
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of ``cache key -> token`` with a per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return token
+
+    def set(self, key, token, timeout):
+        if timeout <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (token, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalTokenCache(get_options()['MAX_ENTRIES'])
+
+
+def invalidate_tokens(keys):
+    """Forget the cached tokens with these keys, in every process."""
+    cache_keys = [cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+    for key in cache_keys:
+        local_cache.delete(key)
+    shared = get_shared_cache()
+    if shared is not None:
+        # One second longer than a local entry can live, for clock granularity.
+        shared.set_many({key: TOMBSTONE for key in cache_keys}, get_options()['TIMEOUT'] + 1)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication backed by the per-process token cache."""
+
+    def authenticate_credentials(self, key):
+        shared = get_shared_cache()
+        if shared is None:
+            return super().authenticate_credentials(key)
+        ckey = cache_key(key)
+        token = local_cache.get(ckey)
+        if token is not None and shared.get(ckey) is None:
+            return token.user, token
+        # Raises AuthenticationFailed for unknown keys and inactive users.
+        user, token = super().authenticate_credentials(key)
+        if shared.get(ckey) is None:
+            # Not revoked while it was being read.
+            local_cache.set(ckey, token, get_options()['TIMEOUT'])
+        return user, token
+
+
+@checks.register(checks.Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    if get_shared_cache() is None:
+        return [checks.Warning(
+            'CachedTokenAuthentication is not caching: its cache is local to each process.',
+            hint="Point TOKEN_AUTH_CACHE['ALIAS'] at a cache shared by every worker process.",
+            id='api.W001',
+        )]
+    return []
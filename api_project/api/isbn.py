@@ -0,0 +1,40 @@
+"""
+ISBN normalization.
+
+Books store ISBNs in one canonical form: the 13 digits of the ISBN-13,
+without hyphens or spaces. ISBN-10s are converted (978 prefix, new check
+digit), so ``0-306-40615-2`` and ``978-0-306-40615-7`` are the same key and
+an exact lookup on the unique ``isbn`` column finds either.
+"""
+import re
+
+SEPARATORS_RE = re.compile(r'[\s-]')
+
+
+def isbn10_is_valid(isbn):
+    if not re.fullmatch(r'\d{9}[\dX]', isbn):
+        return False
+    digits = [10 if char == 'X' else int(char) for char in isbn]
+    return sum((10 - i) * digit for i, digit in enumerate(digits)) % 11 == 0
+
+
+def isbn13_check_digit(first12):
+    total = sum((3 if i % 2 else 1) * int(char) for i, char in enumerate(first12))
+    return str(-total % 10)
+
+
+def isbn13_is_valid(isbn):
+    return bool(re.fullmatch(r'\d{13}', isbn)) and isbn13_check_digit(isbn[:12]) == isbn[12]
+
+
+def normalize_isbn(value):
+    """Return ``value`` as a bare ISBN-13, or None if it is not a valid ISBN."""
+    if not isinstance(value, str):
+        return None
+    isbn = SEPARATORS_RE.sub('', value).upper()
+    if isbn13_is_valid(isbn):
+        return isbn
+    if isbn10_is_valid(isbn):
+        first12 = '978' + isbn[:9]
+        return first12 + isbn13_check_digit(first12)
+    return None
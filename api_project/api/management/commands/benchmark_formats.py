@@ -0,0 +1,18 @@
+from api.isbn import isbn13_check_digit
+from api.models import Book
+from api.serializers import BookSerializer
+from api_project.format_benchmark import FormatBenchmarkCommand
+
+
+class Command(FormatBenchmarkCommand):
+
+    def book_data(self, options):
+        isbns = [f'978{i:09d}' for i in range(options['books'])]
+        Book.objects.bulk_create(
+            Book(
+                title=f'Book {i}', author=f'Author {i % 100}', publication_year=1900 + i % 120,
+                isbn=isbn + isbn13_check_digit(isbn),
+            )
+            for i, isbn in enumerate(isbns)
+        )
+        return BookSerializer(Book.objects.all(), many=True).data
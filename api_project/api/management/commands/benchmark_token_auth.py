@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, local_cache
+from api.models import Book
+from api.views import BookViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare database round trips and latency per authenticated request on '
+        'BookViewSet with TokenAuthentication and CachedTokenAuthentication, on '
+        'a throwaway in-memory test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--books', type=int, default=20)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = User.objects.create_user('benchmark')
+            token = Token.objects.create(user=user)
+            Book.objects.bulk_create(
+                Book(title=f'Book {i}', author=f'Author {i % 5}', publication_year=2000)
+                for i in range(options['books'])
+            )
+            local_cache.clear()
+            factory = APIRequestFactory()
+            for authentication_class in (TokenAuthentication, CachedTokenAuthentication):
+                view = BookViewSet.as_view({'get': 'list'}, authentication_classes=[authentication_class])
+                queries, timings = self.run(view, factory, token.key, options['requests'])
+                self.stdout.write(
+                    f'{authentication_class.__name__:<28} {queries:.2f} queries/request  '
+                    f'p50 {statistics.median(timings) * 1000:6.3f} ms'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, view, factory, key, requests):
+        timings = []
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(requests):
+                request = factory.get('/api/books_all/', HTTP_AUTHORIZATION=f'Token {key}')
+                started = time.perf_counter()
+                response = view(request)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'Request failed with status {response.status_code}.')
+        return len(captured) / requests, timings
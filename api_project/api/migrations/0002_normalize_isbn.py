@@ -0,0 +1,57 @@
+import re
+
+from django.db import migrations
+
+
+# A frozen copy of api.isbn.normalize_isbn, so later changes to the app code
+# cannot change what this migration does.
+def normalize_isbn(value):
+    isbn = re.sub(r'[\s-]', '', value).upper()
+    if re.fullmatch(r'\d{13}', isbn):
+        return isbn if isbn13_check_digit(isbn[:12]) == isbn[12] else None
+    if re.fullmatch(r'\d{9}[\dX]', isbn):
+        digits = [10 if char == 'X' else int(char) for char in isbn]
+        if sum((10 - i) * digit for i, digit in enumerate(digits)) % 11:
+            return None
+        first12 = '978' + isbn[:9]
+        return first12 + isbn13_check_digit(first12)
+    return None
+
+
+def isbn13_check_digit(first12):
+    total = sum((3 if i % 2 else 1) * int(char) for i, char in enumerate(first12))
+    return str(-total % 10)
+
+
+def normalize_isbns(apps, schema_editor):
+    """
+    Rewrite stored ISBNs as bare ISBN-13s. Rows whose ISBN is not valid, or
+    would collide with another book's, are left alone.
+    """
+    Book = apps.get_model('api', 'Book')
+    books = list(Book.objects.exclude(isbn=None).only('isbn'))
+    taken = {book.isbn for book in books}
+    changed = []
+    for book in books:
+        if not book.isbn.strip():
+            # Blank ISBNs would collide on the unique index.
+            normalized = None
+        else:
+            normalized = normalize_isbn(book.isbn)
+            if normalized is None or normalized == book.isbn or normalized in taken:
+                continue
+            taken.add(normalized)
+        book.isbn = normalized
+        changed.append(book)
+    Book.objects.bulk_update(changed, ['isbn'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_isbns, migrations.RunPython.noop),
+    ]
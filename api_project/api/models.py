@@ -1,5 +1,8 @@
 from django.db import models
 
+from .isbn import normalize_isbn
+
+
 class Book(models.Model):
     """
     Book model for the API
@@ -11,6 +14,14 @@ class Book(models.Model):
     
     def __str__(self):
         return f"{self.title} by {self.author}"
+
+    def save(self, *args, **kwargs):
+        # Store ISBNs as bare ISBN-13s so lookups can match them exactly.
+        # Values that are not valid ISBNs are kept as given; the serializer
+        # rejects them.
+        if self.isbn is not None:
+            self.isbn = normalize_isbn(self.isbn) or self.isbn.strip() or None
+        super().save(*args, **kwargs)
     
     class Meta:
         ordering = ['title']
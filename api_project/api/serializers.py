@@ -1,13 +1,95 @@
 from rest_framework import serializers
+from .isbn import normalize_isbn
 from .models import Book
 
-class BookSerializer(serializers.ModelSerializer):
+
+def parse_field_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Lets read requests narrow the output with ``?fields=id,title`` and/or
+    ``?exclude=isbn``. Writes always use every field.
+    """
+    fields_param = 'fields'
+    exclude_param = 'exclude'
+
+    @classmethod
+    def sparse_field_names(cls, request, available):
+        """
+        Return the names in ``available`` that ``request`` asks for, or None
+        when it does not narrow them. Unknown names are a ValidationError.
+        """
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        fields = request.query_params.get(cls.fields_param)
+        exclude = request.query_params.get(cls.exclude_param)
+        if fields is None and exclude is None:
+            return None
+        wanted = parse_field_list(fields) if fields is not None else list(available)
+        dropped = parse_field_list(exclude or '')
+        for param, names in ((cls.fields_param, wanted), (cls.exclude_param, dropped)):
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise serializers.ValidationError({
+                    param: f'Unknown fields: {", ".join(unknown)}. Choose from: {", ".join(available)}.'
+                })
+        return [name for name in available if name in wanted and name not in dropped]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.sparse_field_names(self.context.get('request'), list(fields))
+        if names is None:
+            return fields
+        return {name: fields[name] for name in names}
+
+
+class ISBNField(serializers.CharField):
+    """
+    Accepts ISBN-10s and ISBN-13s, with or without hyphens, and stores
+    them as bare ISBN-13s. Blank values become null.
+    """
+    default_error_messages = {
+        'invalid_isbn': 'Enter a valid ISBN-10 or ISBN-13.',
+    }
+
+    def run_validation(self, data=serializers.empty):
+        if data == '' and self.allow_null:
+            data = None
+        return super().run_validation(data)
+
+    def to_internal_value(self, data):
+        isbn = normalize_isbn(super().to_internal_value(data))
+        if isbn is None:
+            self.fail('invalid_isbn')
+        return isbn
+
+
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Book model.
     Converts Book instances to JSON and vice versa.
     """
-    
+
+    def build_standard_field(self, field_name, model_field):
+        # Keep the generated kwargs (max_length, unique validator), which
+        # then check the normalized value.
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if field_name == 'isbn':
+            field_class = ISBNField
+        return field_class, field_kwargs
+
     class Meta:
         model = Book
         fields = '__all__'  # Include all fields
-        # Or specify fields: fields = ['id', 'title', 'author', 'publication_year', 'isbn']
\ No newline at end of file
+        # Or specify fields: fields = ['id', 'title', 'author', 'publication_year', 'isbn']
+
+
+class ISBNLookupSerializer(serializers.Serializer):
+    """Request body of the batch ISBN lookup."""
+    max_isbns = 5000
+
+    isbns = serializers.ListField(
+        child=serializers.CharField(trim_whitespace=True, allow_blank=True), allow_empty=False, max_length=max_isbns,
+    )
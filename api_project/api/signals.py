@@ -0,0 +1,27 @@
+"""
+Keep the token authentication cache (see api.authentication) in step with
+changes to tokens and users.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, created=False, **kwargs):
+    # A new key cannot be cached yet.
+    if not created:
+        invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Deleting a user deletes their token, which sends post_delete above.
+    # Logging in only touches last_login, which tokens do not depend on.
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import gzip
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api_project.wire_formats import unpackb
+from .authentication import TOMBSTONE, LocalTokenCache, cache_key, check_token_cache, local_cache
+from .isbn import isbn13_check_digit
+from .models import Book
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """
+    Tests for CachedTokenAuthentication and its invalidation.
+    """
+
+    def setUp(self):
+        self.cache_dir = cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'tokens': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir},
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+        local_cache.clear()
+        self.addCleanup(local_cache.clear)
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        Book.objects.create(title='Cached', author='Someone', publication_year=2000)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/books_all/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.client.get('/api/books_all/')
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/api/books_all/')
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/books_all/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/books_all/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/books_all/').status_code, 401)
+
+    def test_revocation_reaches_other_processes(self):
+        self.client.get('/api/books_all/')
+        # Another process deactivates the user: only the shared cache is
+        # touched, this process's LRU still holds the token.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        FileBasedCache(self.cache_dir, {}).set(cache_key(self.token.key), TOMBSTONE)
+        self.assertIsNotNone(local_cache.get(cache_key(self.token.key)))
+        self.assertEqual(self.client.get('/api/books_all/').status_code, 401)
+
+    def test_local_entries_expire(self):
+        self.client.get('/api/books_all/')
+        # A write that sends no signal is picked up once the entry expires.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with override_settings(TOKEN_AUTH_CACHE={'ALIAS': 'tokens', 'TIMEOUT': 0}):
+            local_cache.clear()
+            self.assertEqual(self.client.get('/api/books_all/').status_code, 401)
+
+    def test_shared_cache_holds_no_tokens(self):
+        self.client.get('/api/books_all/')
+        self.assertIsNone(caches['tokens'].get(cache_key(self.token.key)))
+        self.user.save()
+        self.assertEqual(caches['tokens'].get(cache_key(self.token.key)), TOMBSTONE)
+
+    def test_login_keeps_cache(self):
+        self.client.get('/api/books_all/')
+        User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='reader', password='testpass123')
+        self.assertEqual(local_cache.get(cache_key(self.token.key)), self.token)
+
+    def test_tombstone_is_not_overwritten(self):
+        self.token.save()
+        self.assertEqual(self.client.get('/api/books_all/').status_code, 200)
+        self.assertIsNone(local_cache.get(cache_key(self.token.key)))
+        self.assertEqual(caches['tokens'].get(cache_key(self.token.key)), TOMBSTONE)
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(TOKEN_AUTH_CACHE={'ALIAS': 'default'}):
+            self.assertEqual([error.id for error in check_token_cache(None)], ['api.W001'])
+            for _ in range(2):
+                with self.assertNumQueries(2):
+                    self.client.get('/api/books_all/')
+            self.assertIsNone(local_cache.get(cache_key(self.token.key)))
+        self.assertEqual(check_token_cache(None), [])
+
+    def test_local_cache_is_bounded(self):
+        lru = LocalTokenCache(max_entries=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        lru.set('d', 4, 0)
+        self.assertIsNone(lru.get('d'))
+
+
+class CreateTokensCommandTestCase(TestCase):
+    """
+    Tests for the create_tokens management command.
+    """
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(5)]
+        self.existing = Token.objects.create(user=self.users[1])
+
+    def create_tokens(self, **options):
+        out = StringIO()
+        call_command('create_tokens', stdout=out, **options)
+        return out.getvalue()
+
+    def test_creates_missing_tokens_in_batches(self):
+        # Three queries per batch of two, then one empty SELECT.
+        with self.assertNumQueries(7):
+            output = self.create_tokens(batch_size=2)
+        self.assertEqual(Token.objects.count(), 5)
+        self.assertEqual(Token.objects.get(user=self.users[1]).key, self.existing.key)
+        self.assertIn('Done: 4 tokens created.', output)
+        for token in Token.objects.all():
+            self.assertNotIn(token.key, output)
+
+    def test_counts_only_inserted_tokens(self):
+        bulk_create = Token.objects.bulk_create
+
+        def race(objs, **kwargs):
+            # Another run creates a token between the SELECT and the INSERT.
+            Token.objects.create(user=self.users[0])
+            return bulk_create(objs, **kwargs)
+
+        with patch.object(Token.objects, 'bulk_create', side_effect=race):
+            output = self.create_tokens(batch_size=10)
+        self.assertEqual(Token.objects.count(), 5)
+        self.assertIn('Done: 3 tokens created.', output)
+
+    def test_resume_from(self):
+        output = self.create_tokens(resume_from=self.users[3].pk)
+        self.assertEqual(
+            set(Token.objects.values_list('user', flat=True)),
+            {self.users[1].pk, self.users[3].pk, self.users[4].pk},
+        )
+        self.assertIn(f'--resume-from {self.users[4].pk + 1}', output)
+
+    def test_dry_run(self):
+        output = self.create_tokens(dry_run=True)
+        self.assertIn('4 users without a token', output)
+        self.assertEqual(Token.objects.count(), 1)
+
+
+class SparseFieldsetTestCase(TestCase):
+    """
+    Tests for ?fields= and ?exclude= on the book endpoints.
+    """
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Sparse', author='Someone', publication_year=2000, isbn='9780000000001',
+        )
+        self.user = User.objects.create_user(username='writer')
+        self.client = APIClient()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries[-1]['sql']
+
+    def test_fields(self):
+        books, sql = self.get('/api/books_all/?fields=id,title')
+        self.assertEqual(books, [{'id': self.book.id, 'title': 'Sparse'}])
+        self.assertNotIn('"isbn"', sql)
+        self.assertNotIn('"author"', sql)
+
+    def test_exclude(self):
+        book, sql = self.get(f'/api/books_all/{self.book.id}/?exclude=isbn,author')
+        self.assertEqual(book, {'id': self.book.id, 'title': 'Sparse', 'publication_year': 2000})
+        self.assertNotIn('"isbn"', sql)
+
+    def test_list_view(self):
+        books, _ = self.get('/api/books/?fields=title')
+        self.assertEqual(books, [{'title': 'Sparse'}])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/books_all/?fields=id,price')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json()['fields'])
+
+    def test_writes_use_every_field(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            '/api/books_all/?fields=id', {'title': 'New', 'author': 'Someone'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['title'], 'New')
+
+
+class ISBNLookupTestCase(TestCase):
+    """
+    Tests for ISBN normalization and the batch lookup endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.client = APIClient()
+        self.dune = Book.objects.create(title='Dune', author='Frank Herbert', isbn='0-306-40615-2')
+        self.emma = Book.objects.create(title='Emma', author='Jane Austen', isbn='978-0-8044-2957-3')
+
+    def test_isbns_are_normalized_on_save(self):
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.isbn, '9780306406157')
+        self.assertEqual(Book.objects.get(isbn='9780804429573'), self.emma)
+
+    def test_serializer_normalizes_and_validates(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            '/api/books_all/', {'title': 'New', 'author': 'Someone', 'isbn': '1-56619-909-3'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['isbn'], '9781566199094')
+
+        response = self.client.post(
+            '/api/books_all/', {'title': 'Bad', 'author': 'Someone', 'isbn': '0-306-40615-3'}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('isbn', response.json())
+
+        # The ISBN-10 form of an existing ISBN-13 is a duplicate.
+        response = self.client.post(
+            '/api/books_all/', {'title': 'Again', 'author': 'Someone', 'isbn': '0306406152'}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('isbn', response.json())
+
+    def test_lookup(self):
+        response = self.client.post('/api/books_all/lookup/', {'isbns': [
+            '0306406152', '978-0-8044-2957-3', '9781566199094', 'not-an-isbn', ' ',
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['found']['0306406152']['id'], self.dune.id)
+        self.assertEqual(data['found']['978-0-8044-2957-3']['title'], 'Emma')
+        self.assertEqual(data['not_found'], ['9781566199094'])
+        self.assertEqual(data['invalid'], ['not-an-isbn', ''])
+
+    def test_lookup_queries_per_chunk(self):
+        isbns = [f'979{i:09d}' for i in range(1200)]
+        isbns = [isbn + isbn13_check_digit(isbn) for isbn in isbns]
+        Book.objects.bulk_create(Book(title=isbn, author='Someone', isbn=isbn) for isbn in isbns)
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/books_all/lookup/', {'isbns': isbns}, format='json')
+        self.assertEqual(len(response.json()['found']), 1200)
+
+    def test_lookup_limits(self):
+        response = self.client.post('/api/books_all/lookup/', {'isbns': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/books_all/lookup/', {'isbns': ['0306406152'] * 5001}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseFormatTestCase(TestCase):
+    """
+    Tests for the MessagePack renderer and response compression.
+    """
+
+    def setUp(self):
+        Book.objects.bulk_create(
+            Book(title=f'Book {i}', author='Someone', publication_year=2000 + i) for i in range(20)
+        )
+        self.client = APIClient()
+
+    def test_messagepack(self):
+        for url in ('/api/books/', '/api/books_all/', '/api/books_all/?fields=id,title'):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertEqual(unpackb(response.content), data)
+
+    def test_compression(self):
+        plain = self.client.get('/api/books_all/')
+        self.assertGreater(len(plain.content), 1024)
+        response = self.client.get('/api/books_all/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get('/api/books_all/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION=None):
+            response = self.client.get('/api/books_all/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -1,10 +1,35 @@
 from rest_framework import generics, viewsets
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from api_project.wire_formats import MessagePackRenderer
+from .isbn import normalize_isbn
 from .models import Book
-from .serializers import BookSerializer
+from .serializers import BookSerializer, ISBNLookupSerializer
+
+
+class SparseFieldsetViewMixin:
+    """
+    Loads only the columns behind the fields a read request picks with
+    ``?fields=`` / ``?exclude=`` (see SparseFieldsetMixin), using ``.only()``.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        fields = serializer_class().fields
+        names = serializer_class.sparse_field_names(self.request, list(fields))
+        if names is None:
+            return queryset
+        opts = queryset.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        columns = {fields[name].source for name in names} & concrete
+        return queryset.only(opts.pk.name, *columns)
+
 
 # Keep the existing BookList view
-class BookList(generics.ListAPIView):
+class BookList(SparseFieldsetViewMixin, generics.ListAPIView):
     """
     API endpoint that allows books to be viewed as a list.
     GET /api/books/ - Returns list of all books
@@ -12,14 +37,56 @@ class BookList(generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]  # Add this
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for performing CRUD operations on Book model.
     Requires authentication for create, update, delete.
     Anyone can read.
+    Reads take ?fields=id,title or ?exclude=isbn to trim rows and payloads.
+    POST /api/books_all/lookup/ finds books by a list of ISBNs.
+    Send Accept: application/msgpack for MessagePack instead of JSON.
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]  # Add this
\ No newline at end of file
+    permission_classes = [IsAuthenticatedOrReadOnly]  # Add this
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    # ISBNs per IN (...) query; stays under SQLite's bound parameter limit.
+    lookup_chunk_size = 500
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def lookup(self, request):
+        """
+        Look up to ``ISBNLookupSerializer.max_isbns`` ISBNs, in any ISBN-10 or
+        ISBN-13 form, with one query per ``lookup_chunk_size`` distinct ones.
+        Books are keyed by the ISBN as it was sent.
+        """
+        serializer = ISBNLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = {}
+        invalid = []
+        for isbn in serializer.validated_data['isbns']:
+            normalized = normalize_isbn(isbn)
+            if normalized is None:
+                invalid.append(isbn)
+            else:
+                requested[isbn] = normalized
+
+        wanted = list(dict.fromkeys(requested.values()))
+        books = {}
+        queryset = self.get_queryset().order_by()
+        for start in range(0, len(wanted), self.lookup_chunk_size):
+            chunk = wanted[start:start + self.lookup_chunk_size]
+            books.update((book.isbn, book) for book in queryset.filter(isbn__in=chunk))
+
+        data = dict(zip(books, self.get_serializer(list(books.values()), many=True).data))
+        found = {}
+        not_found = []
+        for isbn, normalized in requested.items():
+            if normalized in data:
+                found[isbn] = data[normalized]
+            else:
+                not_found.append(isbn)
+        return Response({'found': found, 'not_found': not_found, 'invalid': invalid})
\ No newline at end of file
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings include the other middleware.
+    'api_project.request_metrics.RequestMetricsMiddleware',
+    'api_project.wire_formats.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Query counts and timings per request (see api_project.request_metrics).
+REQUEST_METRICS = {
+    'SERVER_TIMING': True,
+}
+
+# gzip/deflate for API responses whose client accepts them (see
+# api_project.wire_formats). Remove it to send every body as is.
+RESPONSE_COMPRESSION = {
+    'ENCODINGS': ['gzip', 'deflate'],
+    'LEVEL': 6,
+    'MIN_LENGTH': 1024,
+}
+
 ROOT_URLCONF = 'api_project.urls'
 
 TEMPLATES = [
@@ -127,10 +143,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by every worker process on the machine; use Redis or Memcached
+    # when the workers run on more than one.
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'tokens',
+    },
+}
+
+# Cache of resolved tokens for CachedTokenAuthentication (see api.authentication).
+TOKEN_AUTH_CACHE = {
+    'ALIAS': 'tokens',
+    'TIMEOUT': 60,
+    'MAX_ENTRIES': 1024,
+}
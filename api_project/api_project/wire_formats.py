@@ -0,0 +1 @@
+../../shared/wire_formats.py
\ No newline at end of file
@@ -4,7 +4,7 @@ from .models import Post,Tag
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'published_date']
+    list_display = ['title', 'author', 'published_date', 'comment_count']
     list_filter = ['published_date', 'author']
     search_fields = ['title', 'content']
     date_hierarchy = 'published_date'
@@ -25,5 +25,6 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ['name']
     
     def post_count(self, obj):
-        return obj.posts.count()
+        return obj.post_count
     post_count.short_description = 'Number of Posts'
+    post_count.admin_order_field = 'post_count'
@@ -0,0 +1,84 @@
+"""
+Async versions of the blog's read-only views.
+
+blog.urls serves these instead of the sync views when BLOG_ASYNC_VIEWS is
+on, which it is only when the environment sets BLOG_ASYNC_VIEWS=1, under
+either entry point. Page queries go through
+the async ORM. Templates are rendered in a worker thread, because the
+fragment cache and context processors can still query lazily.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render
+
+from .fragments import apost_version
+from .models import Post, Tag
+from .pagination import InvalidCursor, KeysetPaginator
+from .views import (
+    PostByTagListView, PostDetailView, PostListView, post_detail_context,
+    search_context, search_paginator, tagged_posts,
+)
+
+arender = sync_to_async(render)
+
+
+async def get_page(paginator, request):
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+    if page.has_other_pages():
+        # "Page X of N" needs the total; fetch it here, not in the template.
+        await paginator.acount()
+    return page
+
+
+def list_context(page, **extra):
+    return {
+        'posts': page.object_list,
+        'page_obj': page,
+        'paginator': page.paginator,
+        'is_paginated': page.has_other_pages(),
+        **extra,
+    }
+
+
+async def post_list(request):
+    view = PostListView
+    paginator = KeysetPaginator(
+        Post.objects.for_listing(), view.paginate_by, ordering=view.keyset_ordering,
+    )
+    page = await get_page(paginator, request)
+    return await arender(request, view.template_name, list_context(page))
+
+
+async def posts_by_tag(request, tag_name):
+    view = PostByTagListView
+    tag = await aget_object_or_404(Tag, name=tag_name)
+    paginator = KeysetPaginator(
+        tagged_posts(tag, view.tag_scan_threshold).for_listing(),
+        view.paginate_by,
+        ordering=view.keyset_ordering,
+        count=tag.post_count,
+    )
+    page = await get_page(paginator, request)
+    return await arender(request, view.template_name, list_context(page, tag=tag))
+
+
+async def post_detail(request, pk):
+    post = await aget_object_or_404(Post.objects.select_related('author'), pk=pk)
+    user = await request.auser()
+    comment_owner = 0
+    if user.is_authenticated and await post.comments.filter(author=user).aexists():
+        comment_owner = user.pk
+    context = {'post': post, 'object': post}
+    context.update(post_detail_context(post, await apost_version(post.pk), comment_owner))
+    return await arender(request, PostDetailView.template_name, context)
+
+
+async def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search_paginator(query)
+    page = await paginator.aget_page(request.GET.get('cursor'))
+    await paginator.acount()
+    return await arender(request, 'blog/search_results.html', search_context(query, page))
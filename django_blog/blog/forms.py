@@ -21,20 +21,21 @@ class PostForm(forms.ModelForm):
             # Populate tags field with existing tags
             self.fields['tags'].initial = ', '.join([tag.name for tag in self.instance.tags.all()])
     
-    def save(self, commit=True):
-        instance = super().save(commit=False)
-        if commit:
-            instance.save()
-        
-        # Handle tags
-        if 'tags' in self.cleaned_data:
-            instance.tags.clear()
-            tag_names = [name.strip() for name in self.cleaned_data['tags'].split(',') if name.strip()]
-            for tag_name in tag_names:
-                tag, created = Tag.objects.get_or_create(name=tag_name.lower())
-                instance.tags.add(tag)
-        
-        return instance
+    def clean_tags(self):
+        tag_names = []
+        for name in self.cleaned_data['tags'].split(','):
+            name = name.strip().lower()
+            if not name:
+                continue
+            if len(name) > Tag._meta.get_field('name').max_length:
+                raise forms.ValidationError(f'Tag "{name}" is too long.')
+            tag_names.append(name)
+        return tag_names
+
+    def _save_m2m(self):
+        # Tags are entered as text, so sync them by name instead of letting
+        # ModelForm assign cleaned_data['tags'] to the relation.
+        self.instance.set_tag_names(self.cleaned_data.get('tags', []))
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -0,0 +1,44 @@
+"""
+Versioned fragment caching for post pages.
+
+Every post has a version token in the fragment cache. Templates key their
+``{% cache %}`` blocks on it, and signals drop the token whenever the post,
+its tags or its comments change, so stale fragments are simply never read
+again and expire on their own.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'blog:post-version:{}'
+
+
+def get_fragment_cache_alias():
+    return getattr(settings, 'BLOG_FRAGMENT_CACHE', 'default')
+
+
+def get_fragment_cache():
+    return caches[get_fragment_cache_alias()]
+
+
+def get_fragment_timeout():
+    return getattr(settings, 'BLOG_FRAGMENT_TIMEOUT', 60 * 60 * 24)
+
+
+def post_version(post_id):
+    return get_fragment_cache().get_or_set(
+        VERSION_KEY.format(post_id), lambda: uuid4().hex, get_fragment_timeout()
+    )
+
+
+async def apost_version(post_id):
+    return await get_fragment_cache().aget_or_set(
+        VERSION_KEY.format(post_id), lambda: uuid4().hex, get_fragment_timeout()
+    )
+
+
+def invalidate_posts(post_ids):
+    keys = [VERSION_KEY.format(pk) for pk in post_ids]
+    if keys:
+        get_fragment_cache().delete_many(keys)
@@ -0,0 +1,182 @@
+"""
+Buffered comment ingestion.
+
+With ``BLOG_COMMENT_BUFFER`` set, ``add_comment`` validates a comment and
+appends it to a spool file instead of saving it. The append is fsynced
+before the response goes out, so an accepted comment survives a crash.
+Spooled comments are written with ``bulk_create`` once the oldest one is
+``MAX_DELAY`` seconds old, by the next request or by ``manage.py
+flush_comments --loop``, in chunks of at most ``MAX_BATCH`` rows.
+
+Every spooled comment carries an ``ingest_id``. A batch that was only
+partly written before a crash is replayed without creating duplicates.
+"""
+import fcntl
+import json
+import os
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Comment, Post
+
+SPOOL_NAME = 'spool.jsonl'
+LOCK_NAME = 'flush.lock'
+
+
+class CommentSpool:
+    def __init__(self, path, max_batch=500, max_delay=2.0, fsync=True):
+        self.path = os.fspath(path)
+        self.max_batch = int(max_batch)
+        self.max_delay = float(max_delay)
+        self.fsync = fsync
+        os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def spool_path(self):
+        return os.path.join(self.path, SPOOL_NAME)
+
+    def append(self, post_id, author_id, content):
+        """Durably queue one comment and return its ingest id."""
+        ingest_id = uuid4().hex
+        line = json.dumps({
+            'id': ingest_id,
+            'post': post_id,
+            'author': author_id,
+            'content': content,
+            'ts': time.time(),
+        }) + '\n'
+        while True:
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if not self._is_current(fd):
+                    # A flush moved the file away while we waited for the lock.
+                    continue
+                os.write(fd, line.encode())
+                if self.fsync:
+                    os.fsync(fd)
+                return ingest_id
+            finally:
+                os.close(fd)
+
+    def _is_current(self, fd):
+        try:
+            return os.fstat(fd).st_ino == os.stat(self.spool_path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def pending_age(self):
+        """Seconds since the oldest spooled comment was accepted, or None."""
+        try:
+            with open(self.spool_path) as spool:
+                first = spool.readline()
+        except FileNotFoundError:
+            return None
+        try:
+            return time.time() - json.loads(first)['ts']
+        except (ValueError, KeyError):
+            return None
+
+    def flush_if_due(self):
+        age = self.pending_age()
+        if age is not None and age >= self.max_delay:
+            return self.flush(block=False)
+        return 0
+
+    def flush(self, block=True):
+        """
+        Write every spooled comment to the database and return how many
+        were created. With ``block=False``, return 0 straight away if
+        another process is already flushing.
+        """
+        with open(os.path.join(self.path, LOCK_NAME), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return 0
+            self._rotate()
+            return sum(self._write_batch(path) for path in self._batches())
+
+    def _rotate(self):
+        """Move the spool aside so new comments start a fresh file."""
+        try:
+            fd = os.open(self.spool_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if self._is_current(fd):
+                os.rename(self.spool_path, os.path.join(self.path, f'batch-{time.time_ns()}.jsonl'))
+        finally:
+            os.close(fd)
+
+    def _batches(self):
+        names = sorted(
+            name for name in os.listdir(self.path)
+            if name.startswith('batch-') and name.endswith('.jsonl')
+        )
+        return [os.path.join(self.path, name) for name in names]
+
+    def _write_batch(self, path):
+        entries = []
+        with open(path) as batch:
+            for line in batch:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Only the last line can be torn, by a crash mid-append,
+                    # and its request never got a response.
+                    continue
+        created = 0
+        for start in range(0, len(entries), self.max_batch):
+            created += self._create(entries[start:start + self.max_batch])
+        os.unlink(path)
+        return created
+
+    def _create(self, entries):
+        with transaction.atomic():
+            done = {
+                ingest_id.hex for ingest_id in
+                Comment.objects.filter(ingest_id__in=[entry['id'] for entry in entries])
+                .order_by().values_list('ingest_id', flat=True)
+            }
+            posts = set(
+                Post.objects.filter(pk__in={entry['post'] for entry in entries})
+                .order_by().values_list('pk', flat=True)
+            )
+            authors = set(
+                get_user_model().objects.filter(pk__in={entry['author'] for entry in entries})
+                .values_list('pk', flat=True)
+            )
+            # Comments on posts or by users deleted since they were accepted
+            # would have been removed with them, so they are dropped.
+            comments = [
+                Comment(
+                    ingest_id=entry['id'],
+                    post_id=entry['post'],
+                    author_id=entry['author'],
+                    content=entry['content'],
+                )
+                for entry in entries
+                if entry['id'] not in done
+                and entry['post'] in posts and entry['author'] in authors
+            ]
+            Comment.objects.bulk_create(comments)
+        return len(comments)
+
+
+def get_comment_spool():
+    """Return the configured ``CommentSpool``, or None to save comments directly."""
+    options = getattr(settings, 'BLOG_COMMENT_BUFFER', None)
+    if not options:
+        return None
+    return CommentSpool(
+        options['PATH'],
+        max_batch=options.get('MAX_BATCH', 500),
+        max_delay=options.get('MAX_DELAY', 2.0),
+        fsync=options.get('FSYNC', True),
+    )
@@ -0,0 +1,221 @@
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from blog.models import Comment, Post, Tag
+from blog.search import get_search_backend
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent-request throughput of the blog read views served '
+        'through the WSGI application (sync views) and the ASGI application '
+        '(async views). Each mode runs in its own process on a throwaway '
+        'in-memory test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, help='Run one mode only and print JSON.')
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Requests in flight at once on the ASGI event loop.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='WSGI worker threads, as a threaded server would run.',
+        )
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument(
+            '--latency-ms', type=float, default=5.0,
+            help='Delay added to every query, to stand in for a database '
+                 'across the network. 0 measures the in-process SQLite only.',
+        )
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            result = self.run_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = [self.spawn(mode, options) for mode in MODES]
+        self.stdout.write(
+            f'{options["requests"]} requests, {options["latency_ms"]:g} ms per query, '
+            f'{options["workers"]} WSGI threads, {options["concurrency"]} ASGI in flight'
+        )
+        for result in results:
+            self.stdout.write(
+                f'{result["mode"]}: {result["rps"]:8.1f} req/s  '
+                f'p50 {result["p50_ms"]:7.1f} ms  p99 {result["p99_ms"]:7.1f} ms  '
+                f'errors {result["errors"]}'
+            )
+        wsgi, asgi = results
+        self.stdout.write(self.style.SUCCESS(
+            f'ASGI / WSGI throughput: {asgi["rps"] / wsgi["rps"]:.2f}x'
+        ))
+
+    def spawn(self, mode, options):
+        """Run one mode in a fresh process, so blog.urls picks its views."""
+        env = dict(os.environ, BLOG_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_read_path', '--mode', mode,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--workers', str(options['workers']),
+            '--posts', str(options['posts']),
+            '--latency-ms', str(options['latency_ms']),
+        ]
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        if proc.returncode:
+            raise CommandError(f'{mode} run failed:\n{proc.stderr}')
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def run_mode(self, options):
+        mode = options['mode']
+        if settings.BLOG_ASYNC_VIEWS != (mode == 'asgi'):
+            raise CommandError(f'Set BLOG_ASYNC_VIEWS={int(mode == "asgi")} for the {mode} run.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            paths = self.seed(options['posts'])
+            self.add_latency(options['latency_ms'] / 1000)
+            paths = list(islice(cycle(paths), options['requests']))
+            if mode == 'wsgi':
+                elapsed, timings, errors = self.run_wsgi(paths, options['workers'])
+            else:
+                elapsed, timings, errors = asyncio.run(self.run_asgi(paths, options['concurrency']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        timings.sort()
+        return {
+            'mode': mode,
+            'requests': len(paths),
+            'errors': errors,
+            'seconds': elapsed,
+            'rps': len(paths) / elapsed,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p99_ms': timings[int(len(timings) * 0.99) - 1] * 1000,
+        }
+
+    def seed(self, count):
+        """Create posts, tags and comments; return the paths to request."""
+        author = User.objects.create_user('benchmark')
+        tags = Tag.objects.resolve(['django', 'python', 'async'])
+        posts = Post.objects.bulk_create(
+            Post(title=f'Post {i}', content=f'Benchmark post {i} about django. ' * 50, author=author)
+            for i in range(count)
+        )
+        Post.tags.through.objects.bulk_create(
+            Post.tags.through(post_id=post.pk, tag_id=tags[i % len(tags)].pk)
+            for i, post in enumerate(posts)
+        )
+        for tag in tags:
+            tag.post_count = tag.posts.count()
+        Tag.objects.bulk_update(tags, ['post_count'])
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, content='Nice post.')
+            for post in posts[:20] for _ in range(5)
+        )
+        get_search_backend().rebuild()
+
+        paths = ['/', '/tags/django/', '/search/?q=django']
+        paths += [f'/post/{post.pk}/' for post in posts[:20]]
+        return paths
+
+    def add_latency(self, seconds):
+        if not seconds:
+            return
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        # Worker threads open their own connections to the shared test database.
+        connection.execute_wrappers.append(delay)
+        connection_created.connect(
+            lambda sender, connection, **kwargs: connection.execute_wrappers.append(delay),
+            weak=False,
+        )
+
+    def run_wsgi(self, paths, workers):
+        from django_blog.wsgi import application
+
+        def call(path):
+            path_info, _, query = path.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path_info, 'QUERY_STRING': query,
+                'SCRIPT_NAME': '', 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+                'HTTP_HOST': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http', 'wsgi.multithread': True,
+                'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            status = []
+            started = time.perf_counter()
+            response = application(environ, lambda s, headers: status.append(s))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return time.perf_counter() - started, status[0].startswith('200')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(call, paths))
+        elapsed = time.perf_counter() - started
+        return elapsed, [t for t, _ in results], sum(not ok for _, ok in results)
+
+    async def run_asgi(self, paths, concurrency):
+        from django_blog.asgi import application
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            path_info, _, query = path.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path_info,
+                'raw_path': path_info.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': [(b'host', b'localhost')],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+            }
+            sent = False
+            status = []
+
+            async def receive():
+                nonlocal sent
+                if not sent:
+                    sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected until the response is sent.
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with limit:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return time.perf_counter() - started, status[0] == 200
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(path) for path in paths))
+        elapsed = time.perf_counter() - started
+        return elapsed, [t for t, _ in results], sum(not ok for _, ok in results)
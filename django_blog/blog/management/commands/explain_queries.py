@@ -0,0 +1,113 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from blog.models import Comment, Post, Tag
+from blog.pagination import KeysetPaginator
+from blog.search import get_search_backend
+from blog.views import PostByTagListView, comment_paginator, tagged_posts
+
+# Plan lines that mean a query reads a whole table or sorts in a temp structure.
+PROBLEMS = {
+    'sqlite': [
+        ('full scan', re.compile(r'\bSCAN (?!.*\b(?:USING (?:COVERING )?INDEX|VIRTUAL TABLE)\b)')),
+        ('temp b-tree sort', re.compile(r'USE TEMP B-TREE')),
+    ],
+    'postgresql': [
+        ('full scan', re.compile(r'Seq Scan on')),
+        ('sort', re.compile(r'\bSort\b(?! Key)')),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the blog app's own querysets and report full table "
+        'scans and temporary sorts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Exit with an error if any query has a problem.',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the plan of every query, not only the problematic ones.',
+        )
+
+    def handle(self, *args, **options):
+        patterns = PROBLEMS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f'No plan checks for the {connection.vendor} backend.')
+
+        flagged = 0
+        for label, queryset, expected in self.get_querysets():
+            plan = queryset.explain()
+            problems = sorted({
+                name for line in plan.splitlines()
+                for name, pattern in patterns if pattern.search(line)
+            })
+            unexpected = [name for name in problems if name not in expected]
+            if unexpected:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'{label}: {", ".join(unexpected)}'))
+            elif problems:
+                self.stdout.write(f'{label}: ok ({", ".join(problems)} expected)')
+            else:
+                self.stdout.write(f'{label}: ok')
+            if unexpected or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if flagged:
+            message = f'{flagged} queries scan a full table or sort without an index.'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('All queries use an index.'))
+
+    def get_querysets(self):
+        """
+        Yield ``(label, queryset, expected problems)`` for the queries the
+        blog views run, built with the same helpers the views use.
+        """
+        now = timezone.now()
+        post = Post.objects.order_by('pk').first() or Post(pk=1, comment_count=0)
+        author_id = post.author_id or 1
+        tag_id = Tag.objects.values_list('pk', flat=True).first() or 1
+        sorts = ('temp b-tree sort', 'sort')
+
+        listing = KeysetPaginator(Post.objects.for_listing(), 10)
+        yield 'post list: first page', listing.page_queryset(), ()
+        yield 'post list: next page', listing.page_queryset('next', [now, post.pk]), ()
+        yield 'post list: previous page', listing.page_queryset('prev', [now, post.pk]), ()
+        yield 'post list: last page', listing.page_queryset('prev'), ()
+        yield 'posts by author', Post.objects.filter(author_id=author_id).order_by('-published_date'), ()
+
+        yield 'posts by tag: tag lookup', Tag.objects.filter(name='django'), ()
+        threshold = PostByTagListView.tag_scan_threshold
+        for size, count, expected in (('small', 0, sorts), ('popular', threshold, ())):
+            # Joining and sorting is the intended plan for a small tag.
+            tag = Tag(pk=tag_id, post_count=count)
+            tagged = KeysetPaginator(tagged_posts(tag, threshold).for_listing(), 10)
+            yield f'posts by {size} tag: first page', tagged.page_queryset(), expected
+            yield f'posts by {size} tag: next page', tagged.page_queryset('next', [now, post.pk]), expected
+        yield 'post tags prefetch', (
+            Post.tags.through.objects.filter(post_id__in=[post.pk]).select_related('tag')
+        ), ()
+
+        # Results are ordered by a per-query rank, so they are always sorted.
+        search = get_search_backend().search('django').for_listing()
+        ranked = KeysetPaginator(search, 10, ordering=('-search_rank', '-published_date', '-pk'))
+        yield 'search: first page', ranked.page_queryset(), sorts
+
+        comments = comment_paginator(post)
+        yield 'comments: first page', comments.page_queryset(), ()
+        yield 'comments: load more', comments.page_queryset('next', [now, 1]), ()
+        yield 'comments: owner check', (
+            Comment.objects.filter(post_id=post.pk, author_id=author_id)
+        ), ()
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.ingest import get_comment_spool
+
+
+class Command(BaseCommand):
+    help = 'Write spooled comments to the database (see BLOG_COMMENT_BUFFER).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every --interval seconds until interrupted.',
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            help='Seconds between flushes with --loop. Defaults to MAX_DELAY.',
+        )
+
+    def handle(self, *args, **options):
+        spool = get_comment_spool()
+        if spool is None:
+            raise CommandError('BLOG_COMMENT_BUFFER is not set.')
+
+        if not options['loop']:
+            created = spool.flush()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {created} comments.'))
+            return
+
+        interval = options['interval'] or spool.max_delay
+        try:
+            while True:
+                created = spool.flush()
+                if created:
+                    self.stdout.write(f'Wrote {created} comments.')
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
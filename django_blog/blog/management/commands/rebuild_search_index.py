@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for blog posts.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Post.objects.count()} posts.'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Comment, Post, Tag
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in Post.comment_count and Tag.post_count, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        comments = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(n=Count('pk')).values('n')
+        )
+        links = (
+            Post.tags.through.objects.filter(tag=OuterRef('pk'))
+            .order_by().values('tag').annotate(n=Count('pk')).values('n')
+        )
+        fixed_posts = self.reconcile(Post, 'comment_count', comments, batch_size)
+        fixed_tags = self.reconcile(Tag, 'post_count', links, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {fixed_posts} post comment counts and {fixed_tags} tag post counts.'
+        ))
+
+    def reconcile(self, model, field, count_subquery, batch_size):
+        """Walk ``model`` in primary-key order and rewrite drifted counters."""
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return fixed
+            last_pk = pks[-1]
+            with transaction.atomic():
+                drifted = list(
+                    model.objects.filter(pk__in=pks)
+                    .select_for_update()
+                    .annotate(actual=Coalesce(Subquery(count_subquery), 0))
+                    .filter(~Q(**{field: F('actual')}))
+                    .only('pk', field)
+                )
+                for obj in drifted:
+                    setattr(obj, field, obj.actual)
+                model.objects.bulk_update(drifted, [field])
+            fixed += len(drifted)
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5("
+    "title, content, tags, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_post_fts (rowid, title, content, tags) "
+    "SELECT p.id, p.title, p.content, COALESCE(group_concat(t.name, ' '), '') "
+    "FROM blog_post p "
+    "LEFT JOIN blog_post_tags pt ON pt.post_id = p.id "
+    "LEFT JOIN blog_tag t ON t.id = pt.tag_id "
+    "GROUP BY p.id",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE blog_post_search ("
+    "post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX blog_post_search_document_idx ON blog_post_search USING GIN (document)",
+    "INSERT INTO blog_post_search (post_id, document) "
+    "SELECT p.id, setweight(to_tsvector('english', p.title), 'A') || "
+    "setweight(to_tsvector('english', COALESCE(string_agg(t.name, ' '), '')), 'B') || "
+    "setweight(to_tsvector('english', p.content), 'C') "
+    "FROM blog_post p "
+    "LEFT JOIN blog_post_tags pt ON pt.post_id = p.id "
+    "LEFT JOIN blog_tag t ON t.id = pt.tag_id "
+    "GROUP BY p.id",
+]
+
+DROP = {
+    'sqlite': ["DROP TABLE IF EXISTS blog_post_fts"],
+    'postgresql': ["DROP TABLE IF EXISTS blog_post_search"],
+}
+
+CREATE = {
+    'sqlite': SQLITE_CREATE,
+    'postgresql': POSTGRES_CREATE,
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_tag_post_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
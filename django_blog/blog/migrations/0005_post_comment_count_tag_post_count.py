@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    Comment = apps.get_model('blog', 'Comment')
+    Through = Post.tags.through
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(n=Count('pk')).values('n')
+    )
+    links = (
+        Through.objects.filter(tag=OuterRef('pk'))
+        .order_by().values('tag').annotate(n=Count('pk')).values('n')
+    )
+    Post.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+    Tag.objects.update(post_count=Coalesce(Subquery(links), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_ingest_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostFTSEntry',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts_entry', serialize=False, to='blog.post')),
+            ],
+            options={
+                'db_table': 'blog_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='blog.post')),
+            ],
+            options={
+                'db_table': 'blog_post_search',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,10 +1,37 @@
+from collections import Counter
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Substr
 from django.urls import reverse
 
+from .fragments import invalidate_posts
+
+
+class TagQuerySet(models.QuerySet):
+    def resolve(self, names):
+        """
+        Return the tags for ``names`` in order, creating missing ones with a
+        single bulk insert. Safe against a concurrent save creating the same
+        tag: conflicting inserts are ignored and the rows are read back.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        tags = {tag.name: tag for tag in self.filter(name__in=names)}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            self.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            tags.update((tag.name, tag) for tag in self.filter(name__in=missing))
+        return [tags[name] for name in names]
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TagQuerySet.as_manager()
     
     def __str__(self):
         return self.name
@@ -12,15 +39,39 @@ class Tag(models.Model):
     class Meta:
         ordering = ['name']
 
+class PostQuerySet(models.QuerySet):
+    # Enough text for the list templates' truncatewords:50.
+    EXCERPT_LENGTH = 1000
+
+    def for_listing(self):
+        """
+        Posts as the list templates show them: author joined, tags
+        prefetched, and only the start of ``content`` loaded as ``excerpt``.
+        """
+        return (
+            self.select_related('author')
+            .prefetch_related('tags')
+            .defer('content')
+            .annotate(excerpt=Substr('content', 1, self.EXCERPT_LENGTH))
+        )
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     published_date = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     tags = models.ManyToManyField(Tag, related_name='posts', blank=True)  # ADD THIS
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
     
     class Meta:
         ordering = ['-published_date']
+        indexes = [
+            models.Index(fields=['published_date', 'id'], name='blog_post_pub_date_id_idx'),
+            models.Index(fields=['author', 'published_date'], name='blog_post_author_pub_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -28,16 +79,93 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.pk})
 
-    
+    def set_tag_names(self, names):
+        """Link exactly the tags named in ``names``, touching only the difference."""
+        wanted = {tag.pk for tag in Tag.objects.resolve(names)}
+        current = set(self.tags.values_list('pk', flat=True))
+        if current - wanted:
+            self.tags.remove(*(current - wanted))
+        if wanted - current:
+            self.tags.add(*(wanted - current))
+
+
+class PostFTSEntry(models.Model):
+    """
+    A post's row in the SQLite FTS5 index (see blog.search), keyed by rowid.
+    Only there so searches can join the index; it is written with raw SQL.
+    """
+    post = models.OneToOneField(
+        Post, models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fts_entry',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'blog_post_fts'
+
+
+class PostSearchDocument(models.Model):
+    """A post's tsvector in the PostgreSQL index (see blog.search)."""
+    post = models.OneToOneField(
+        Post, models.DO_NOTHING, primary_key=True, related_name='search_document',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'blog_post_search'
+
+
+class CommentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips post_save, so bump Post.comment_count here.
+        objs = super().bulk_create(objs, *args, **kwargs)
+        counts = Counter(obj.post_id for obj in objs)
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            # Skipped or updated rows are not told apart from inserted ones,
+            # so count the affected posts' comments instead.
+            recount_comments(counts)
+        else:
+            adjust_comment_counts(counts)
+        invalidate_posts(counts)
+        return objs
+
+
+def adjust_comment_counts(deltas):
+    """Apply ``{post_id: delta}`` to the stored Post.comment_count values."""
+    by_delta = {}
+    for post_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(post_id)
+    for delta, post_ids in by_delta.items():
+        Post.objects.filter(pk__in=post_ids).update(
+            comment_count=Greatest(F('comment_count') + delta, 0)
+        )
+
+
+def recount_comments(post_ids):
+    """Set Post.comment_count of these posts from the comment table."""
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(n=Count('pk')).values('n')
+    )
+    Post.objects.filter(pk__in=post_ids).update(comment_count=Coalesce(Subquery(comments), 0))
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set for comments written from the ingestion spool (see blog.ingest).
+    ingest_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    objects = CommentQuerySet.as_manager()
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='blog_comment_post_created_idx'),
+        ]
     
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
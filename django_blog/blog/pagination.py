@@ -0,0 +1,298 @@
+"""
+Keyset (cursor) pagination for blog listings.
+
+Pages are fetched with ``WHERE (key) < (last key seen)`` instead of OFFSET,
+so deep pages cost the same as the first one. Cursors are opaque tokens
+that carry the boundary key, the direction and the page number shown to
+the reader. The total count is only needed for "Page X of N" and the
+"Last" link, so it is cached (or estimated) rather than run per request.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds; keys must be exact.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, which must end in a unique key
+    (normally ``pk``) so that every row has a distinct position.
+
+    ``count`` may be passed when the caller already knows the total, e.g.
+    from a stored counter. Otherwise ``count_mode`` picks how it is found:
+    ``'cached'`` runs COUNT(*) at most once per ``count_timeout`` seconds,
+    ``'estimate'`` asks the PostgreSQL planner (and falls back to
+    ``'cached'`` elsewhere), and ``'exact'`` counts on every access.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-published_date', '-pk'),
+                 count=None, count_mode='cached', count_timeout=60):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.count_mode = count_mode
+        self.count_timeout = count_timeout
+        if count is not None:
+            self.__dict__['count'] = count
+
+    @cached_property
+    def count(self):
+        queryset = self.queryset.order_by()
+        if self.count_mode == 'exact':
+            return queryset.count()
+        if self.count_mode == 'estimate':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+        key = self._count_cache_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    async def acount(self):
+        """Async ``count``; fills the same cached property."""
+        if 'count' in self.__dict__:
+            return self.count
+        queryset = self.queryset.order_by()
+        if self.count_mode == 'cached':
+            key = self._count_cache_key(queryset)
+            count = await cache.aget(key)
+            if count is None:
+                count = await queryset.acount()
+                await cache.aset(key, count, self.count_timeout)
+        elif self.count_mode == 'exact':
+            count = await queryset.acount()
+        else:
+            count = await sync_to_async(lambda: self.count)()
+        self.__dict__['count'] = count
+        return count
+
+    def _count_cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params!r}'.encode(), usedforsecurity=False).hexdigest()
+        return f'blog:keyset-count:{digest}'
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def page(self, cursor=None):
+        direction, key, number, last = self._resolve(cursor)
+        rows = list(self.page_queryset(direction, key))
+        return self._build_page(rows, direction, key, number, last)
+
+    async def apage(self, cursor=None):
+        """Async ``page()``, for views that use the async ORM."""
+        if cursor and self.decode_cursor(cursor)['d'] == 'last':
+            await self.acount()
+        direction, key, number, last = self._resolve(cursor)
+        rows = [row async for row in self.page_queryset(direction, key)]
+        return self._build_page(rows, direction, key, number, last)
+
+    def get_page(self, cursor=None):
+        """Like ``page()``, but falls back to the first page on a bad cursor."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    async def aget_page(self, cursor=None):
+        try:
+            return await self.apage(cursor)
+        except InvalidCursor:
+            return await self.apage()
+
+    def _resolve(self, cursor):
+        """Return ``(direction, key, page number, is_last)`` for a cursor."""
+        if not cursor:
+            return 'next', None, 1, False
+        state = self.decode_cursor(cursor)
+        if state['d'] == 'last':
+            return 'prev', None, self.num_pages, True
+        return state['d'], state['k'], state['n'], False
+
+    def page_queryset(self, direction='next', key=None):
+        """
+        The query behind one page: rows after ``key`` in ``direction``,
+        plus one extra row to tell whether another page follows.
+        """
+        queryset = self.queryset
+        ordering = self.ordering
+        if direction == 'prev':
+            ordering = tuple(self._reverse(field) for field in ordering)
+        if key is not None:
+            queryset = queryset.filter(self._after(ordering, key))
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def _build_page(self, rows, direction, key, number, last):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+            has_previous, has_next = more, not last
+            if not more:
+                number = 1
+        else:
+            has_previous, has_next = key is not None, more
+        return KeysetPage(rows, max(number, 1), self, has_previous, has_next)
+
+    def _after(self, ordering, key):
+        """Build ``(a, b, c) > (x, y, z)`` for the given per-field directions."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, key):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _reverse(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def key_for(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, direction, key=None, number=1):
+        state = {'d': direction, 'k': key, 'n': number}
+        raw = json.dumps(state, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, number = state['d'], int(state['n'])
+            if direction == 'last':
+                return {'d': direction, 'k': None, 'n': number}
+            if direction not in ('next', 'prev') or len(state['k']) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            key = [
+                self._to_python(field, value)
+                for field, value in zip(self.ordering, state['k'])
+            ]
+        except (ValueError, TypeError, KeyError, binascii.Error) as exc:
+            raise InvalidCursor(cursor) from exc
+        return {'d': direction, 'k': key, 'n': number}
+
+    def _to_python(self, field, value):
+        name = field.lstrip('-')
+        opts = self.queryset.model._meta
+        try:
+            model_field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as search_rank are plain JSON numbers.
+            return value
+        try:
+            return model_field.to_python(value)
+        except ValidationError as exc:
+            raise InvalidCursor(value) from exc
+
+
+class KeysetPage:
+    """
+    The subset of Django's ``Page`` API the blog templates use, plus
+    cursors for the neighbouring, first and last pages.
+    """
+
+    def __init__(self, object_list, number, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        key = self.paginator.key_for(self.object_list[-1])
+        return self.paginator.encode_cursor('next', key, self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        key = self.paginator.key_for(self.object_list[0])
+        return self.paginator.encode_cursor('prev', key, self.number - 1)
+
+    @property
+    def last_cursor(self):
+        return self.paginator.encode_cursor('last', None, self.paginator.num_pages)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that swaps OFFSET pagination for ``KeysetPaginator``.
+    The page is selected with ``?cursor=`` instead of ``?page=``.
+    """
+    keyset_ordering = ('-published_date', '-pk')
+    cursor_kwarg = 'cursor'
+
+    def get_paginator_count(self):
+        """Return a known total for the paginator, or None to count it."""
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size,
+            ordering=self.keyset_ordering,
+            count=self.get_paginator_count(),
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return (paginator, page, page.object_list, page.has_other_pages())
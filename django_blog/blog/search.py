@@ -0,0 +1,235 @@
+"""
+Full-text search backends for blog posts.
+
+Each backend keeps an inverted index of post titles, content and tag names
+and turns a user query into a ranked ``Post`` queryset annotated with
+``search_rank`` (higher is better). The backend is picked from the
+``BLOG_SEARCH_BACKEND`` setting, or from the database vendor when unset.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.fields import BooleanField, FloatField
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a raw query into word tokens, dropping any search syntax."""
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface shared by all search backends.
+
+    ``search()`` returns a queryset so callers can paginate, prefetch and
+    order it like any other ``Post`` queryset.
+    """
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def index_posts(self, post_ids):
+        """(Re)index the given posts, removing ones that no longer exist."""
+
+    def remove_posts(self, post_ids):
+        """Drop the given posts from the index."""
+
+    def rebuild(self):
+        """Rebuild the whole index from the blog tables."""
+
+    def get_documents(self, post_ids):
+        """Return ``(post_id, title, content, tags)`` rows for indexing."""
+        tags = {}
+        through = Post.tags.through
+        rows = (
+            through.objects.filter(post_id__in=post_ids)
+            .values_list('post_id', 'tag__name')
+        )
+        for post_id, tag_name in rows:
+            tags.setdefault(post_id, []).append(tag_name)
+        posts = Post.objects.filter(pk__in=post_ids).values_list('pk', 'title', 'content')
+        return [
+            (pk, title, content, ' '.join(tags.get(pk, [])))
+            for pk, title, content in posts
+        ]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback backend with no index: substring matches on every request.
+    Used on databases without a native full-text engine.
+    """
+
+    def search(self, query):
+        posts = Post.objects.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct()
+        return posts.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 backend. The ``blog_post_fts`` virtual table uses the post id as
+    its rowid, so results join straight back to ``blog_post``.
+    """
+    table = 'blog_post_fts'
+
+    def build_match(self, query):
+        # Quote every token and match it as a prefix; tokens are ANDed.
+        return ' '.join('"%s"*' % token for token in tokenize(query))
+
+    def search(self, query):
+        match = self.build_match(query)
+        if not match:
+            return Post.objects.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        # Join the index, so MATCH runs once and bm25() ranks the rows it
+        # found. (A correlated rank subquery re-runs MATCH for every post.)
+        # bm25() is lower-is-better, so negate it to match the other backends.
+        # Column weights mirror the Postgres backend: title, content, tags.
+        match_sql = '"{table}"."{table}" MATCH %s'.format(table=self.table)
+        rank_sql = '-bm25("{table}", 10.0, 1.0, 5.0)'.format(table=self.table)
+        return Post.objects.filter(
+            RawSQL(match_sql, (match,), output_field=BooleanField()),
+            fts_entry__isnull=False,
+        ).annotate(
+            search_rank=RawSQL(rank_sql, (), output_field=FloatField()),
+        )
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        documents = self.get_documents(post_ids)
+        with connection.cursor() as cursor:
+            self._delete(cursor, post_ids)
+            cursor.executemany(
+                'INSERT INTO {table} (rowid, title, content, tags) '
+                'VALUES (%s, %s, %s, %s)'.format(table=self.table),
+                documents,
+            )
+
+    def remove_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, post_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (rowid, title, content, tags) '
+                'SELECT p.id, p.title, p.content, '
+                "COALESCE(group_concat(t.name, ' '), '') "
+                'FROM blog_post p '
+                'LEFT JOIN blog_post_tags pt ON pt.post_id = p.id '
+                'LEFT JOIN blog_tag t ON t.id = pt.tag_id '
+                'GROUP BY p.id'.format(table=self.table)
+            )
+
+    def _delete(self, cursor, post_ids):
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        cursor.execute(
+            'DELETE FROM {table} WHERE rowid IN ({placeholders})'.format(
+                table=self.table, placeholders=placeholders,
+            ),
+            post_ids,
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector backend. ``blog_post_search`` holds one weighted document per
+    post (title A, tags B, content C) behind a GIN index.
+    """
+    table = 'blog_post_search'
+    config = 'english'
+
+    def build_tsquery(self, query):
+        return ' & '.join('%s:*' % token for token in tokenize(query))
+
+    def search(self, query):
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return Post.objects.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        # Join the index and rank the joined document, as the SQLite backend does.
+        match_sql = '"{table}"."document" @@ to_tsquery(%s, %s)'.format(table=self.table)
+        rank_sql = 'ts_rank("{table}"."document", to_tsquery(%s, %s))'.format(table=self.table)
+        return Post.objects.filter(
+            RawSQL(match_sql, (self.config, tsquery), output_field=BooleanField()),
+            search_document__isnull=False,
+        ).annotate(
+            search_rank=RawSQL(rank_sql, (self.config, tsquery), output_field=FloatField()),
+        )
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        documents = self.get_documents(post_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {table} WHERE post_id = ANY(%s)'.format(table=self.table),
+                [post_ids],
+            )
+            cursor.executemany(
+                'INSERT INTO {table} (post_id, document) VALUES (%s, '
+                "setweight(to_tsvector(%s, %s), 'A') || "
+                "setweight(to_tsvector(%s, %s), 'B') || "
+                "setweight(to_tsvector(%s, %s), 'C'))".format(table=self.table),
+                [
+                    (pk, self.config, title, self.config, tags, self.config, content)
+                    for pk, title, content, tags in documents
+                ],
+            )
+
+    def remove_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE post_id = ANY(%s)'.format(table=self.table),
+                    [post_ids],
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (post_id, document) '
+                "SELECT p.id, setweight(to_tsvector(%s, p.title), 'A') || "
+                "setweight(to_tsvector(%s, COALESCE(string_agg(t.name, ' '), '')), 'B') || "
+                "setweight(to_tsvector(%s, p.content), 'C') "
+                'FROM blog_post p '
+                'LEFT JOIN blog_post_tags pt ON pt.post_id = p.id '
+                'LEFT JOIN blog_tag t ON t.id = pt.tag_id '
+                'GROUP BY p.id'.format(table=self.table),
+                [self.config, self.config, self.config],
+            )
+
+
+BACKENDS = {
+    'sqlite': 'blog.search.SQLiteSearchBackend',
+    'postgresql': 'blog.search.PostgresSearchBackend',
+}
+
+
+def get_search_backend():
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    if not path:
+        path = BACKENDS.get(connection.vendor, 'blog.search.DatabaseSearchBackend')
+    return import_string(path)()
@@ -0,0 +1,158 @@
+from django.db.models import DEFERRED, F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from .fragments import invalidate_posts
+from .models import Comment, Post, Tag, adjust_comment_counts
+from .search import get_search_backend
+
+
+def reindex_posts(post_ids):
+    """Refresh the search index and cached fragments of these posts."""
+    post_ids = set(post_ids)
+    if post_ids:
+        get_search_backend().index_posts(post_ids)
+        invalidate_posts(post_ids)
+
+
+# Search index and fragment cache maintenance
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    get_search_backend().remove_posts([instance.pk])
+    invalidate_posts([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_retagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            reindex_posts([instance.pk])
+        return
+    # tag.posts.add()/remove()/clear(): reindex the posts on the other side.
+    if action == 'pre_clear':
+        instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        reindex_posts(getattr(instance, '_cleared_post_ids', []))
+    else:
+        reindex_posts(pk_set or [])
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        reindex_posts(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def collect_deleted_tag_posts(sender, instance, **kwargs):
+    instance._indexed_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_deleted_tag(sender, instance, **kwargs):
+    reindex_posts(getattr(instance, '_indexed_post_ids', []))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_thread(sender, instance, **kwargs):
+    # Runs before the counter receivers, which update _counted_post_id.
+    post_ids = {instance.post_id, getattr(instance, '_counted_post_id', DEFERRED)}
+    post_ids.discard(DEFERRED)
+    invalidate_posts(post_ids)
+
+
+# Counter maintenance: Post.comment_count and Tag.post_count
+def adjust_post_counts(tag_ids, delta):
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(
+            post_count=Greatest(F('post_count') + delta, 0)
+        )
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_post(sender, instance, **kwargs):
+    # Reading a deferred post_id would cost a query per loaded comment.
+    instance._counted_post_id = instance.__dict__.get('post_id', DEFERRED)
+
+
+@receiver(pre_save, sender=Comment)
+def load_deferred_comment_post(sender, instance, raw=False, **kwargs):
+    # Comments loaded without post_id look up the stored one before saving.
+    if raw or instance._state.adding or instance._counted_post_id is not DEFERRED:
+        return
+    instance._counted_post_id = (
+        Comment.objects.filter(pk=instance.pk).values_list('post_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._counted_post_id
+    if created:
+        adjust_comment_counts({instance.post_id: 1})
+    elif previous != instance.post_id:
+        adjust_comment_counts({previous: -1, instance.post_id: 1})
+    instance._counted_post_id = instance.post_id
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    adjust_comment_counts({instance.post_id: -1})
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tag_links(sender, instance, action, reverse, pk_set, **kwargs):
+    through = Post.tags.through
+    if action == 'pre_remove':
+        # remove() reports every requested pk, linked or not; keep the real ones.
+        if reverse:
+            links = through.objects.filter(tag_id=instance.pk, post_id__in=pk_set)
+            instance._unlinked_pks = set(links.values_list('post_id', flat=True))
+        else:
+            links = through.objects.filter(post_id=instance.pk, tag_id__in=pk_set)
+            instance._unlinked_pks = set(links.values_list('tag_id', flat=True))
+    elif action == 'pre_clear':
+        if reverse:
+            instance._unlinked_pks = set(instance.posts.values_list('pk', flat=True))
+        else:
+            instance._unlinked_pks = set(instance.tags.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_add':
+            # add() only reports pks that were actually inserted.
+            changed, delta = pk_set or set(), 1
+        else:
+            changed, delta = getattr(instance, '_unlinked_pks', set()), -1
+            instance._unlinked_pks = set()
+        if not changed:
+            return
+        if reverse:
+            Tag.objects.filter(pk=instance.pk).update(
+                post_count=Greatest(F('post_count') + delta * len(changed), 0)
+            )
+        else:
+            adjust_post_counts(changed, delta)
+
+
+@receiver(pre_delete, sender=Post)
+def collect_deleted_post_tags(sender, instance, **kwargs):
+    # Deleting a post drops its tag links without sending m2m_changed.
+    instance._counted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post_tags(sender, instance, **kwargs):
+    adjust_post_counts(getattr(instance, '_counted_tag_ids', []), -1)
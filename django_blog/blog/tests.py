@@ -1,3 +1,800 @@
-from django.test import TestCase
+import importlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from io import StringIO
+from types import ModuleType
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import path, reverse
+
+from django_blog.request_metrics import registry
+
+from . import views
+from .forms import PostForm
+from .fragments import post_version
+from .ingest import get_comment_spool
+from .models import Comment, Post, Tag
+from .pagination import KeysetPaginator
+from .search import get_search_backend
+
+
+# Queries each read-only view may run for an anonymous visitor, whatever
+# the page size. Bump these only together with a change to the view.
+QUERY_BUDGETS = {
+    'post-list': 3,        # cached count, posts + authors, tags
+    'posts-by-tag': 3,     # tag, posts + authors, tags
+    'search': 3,           # cached count, ranked posts + authors, tags
+    'post-detail': 3,      # post + author, then tags and comments + authors on a cache miss
+    'post-comments': 2,    # post, comment page + authors
+}
+
+
+class QueryBudgetMixin:
+    """
+    Fails a test when a view runs more queries than QUERY_BUDGETS allows.
+    """
+
+    def assertWithinQueryBudget(self, name, *args, data=None):
+        budget = QUERY_BUDGETS[name]
+        url = reverse(name, args=args)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        if len(queries) > budget:
+            self.fail(
+                f'{name} ran {len(queries)} queries, budget is {budget}:\n'
+                + '\n'.join(query['sql'] for query in queries)
+            )
+        return response
+
+
+class SearchTestCase(TestCase):
+    """
+    Tests for the full-text search index behind search_posts.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.django_post = Post.objects.create(
+            title='Getting started with Django',
+            content='Models, views and templates.',
+            author=self.user,
+        )
+        self.python_post = Post.objects.create(
+            title='Python tips',
+            content='Generators are lazy. Django is mentioned once.',
+            author=self.user,
+        )
+
+    def search(self, query):
+        return list(get_search_backend().search(query).order_by('-search_rank', '-pk'))
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.search('django'), [self.django_post, self.python_post])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('gener'), [self.python_post])
+
+    def test_index_follows_post_updates_and_deletes(self):
+        self.python_post.title = 'Flask tips'
+        self.python_post.save()
+        self.assertEqual(self.search('flask'), [self.python_post])
+
+        self.python_post.delete()
+        self.assertEqual(self.search('flask'), [])
+
+    def test_index_follows_tag_changes(self):
+        tag = Tag.objects.create(name='orm')
+        self.django_post.tags.add(tag)
+        self.assertEqual(self.search('orm'), [self.django_post])
+
+        tag.name = 'querysets'
+        tag.save()
+        self.assertEqual(self.search('orm'), [])
+        self.assertEqual(self.search('querysets'), [self.django_post])
+
+        tag.delete()
+        self.assertEqual(self.search('querysets'), [])
+
+    def test_query_syntax_is_ignored(self):
+        self.assertEqual(self.search('"django* OR'), [])
+        self.assertEqual(self.search('django*'), [self.django_post, self.python_post])
+
+    def test_rebuild_command(self):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM blog_post_fts')
+            self.assertEqual(self.search('django'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('django'), [self.django_post, self.python_post])
+
+    def test_search_view_paginates(self):
+        for i in range(12):
+            Post.objects.create(title=f'Django post {i}', content='...', author=self.user)
+
+        response = self.client.get(reverse('search'), {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+        self.assertEqual(len(response.context['posts']), 10)
+
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('search'), {'q': 'django', 'cursor': cursor})
+        self.assertEqual(len(response.context['posts']), 4)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_match_runs_once_per_query(self):
+        # A correlated rank subquery would repeat the full-text match per post.
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse('search'), {'q': 'django'})
+        searches = [q['sql'] for q in captured if 'blog_post_fts' in q['sql'] or 'blog_post_search' in q['sql']]
+        self.assertTrue(searches)
+        for sql in searches:
+            self.assertEqual(sql.count('MATCH') + sql.count('@@'), 1, sql)
+
+    def test_search_keeps_up_with_substring_scan(self):
+        Post.objects.bulk_create(
+            Post(title=f'Django post {i}', content='About django. ' * 20, author=self.user)
+            for i in range(1000)
+        )
+        get_search_backend().rebuild()
+
+        def page_time(query):
+            best = None
+            for _ in range(3):
+                started = time.perf_counter()
+                list(views.search_paginator(query).page_queryset())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+
+        indexed = page_time('django')
+        with override_settings(BLOG_SEARCH_BACKEND='blog.search.DatabaseSearchBackend'):
+            scan = page_time('django')
+        # Generous: the per-post rank subquery was about 50x slower.
+        self.assertLess(indexed, scan * 5 + 0.02)
+
+
+class CounterTestCase(TestCase):
+    """
+    Tests for the stored Post.comment_count and Tag.post_count counters.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='First', content='...', author=self.user)
+        self.other = Post.objects.create(title='Second', content='...', author=self.user)
+
+    def assertCounts(self, post=None, other=None, **tags):
+        if post is not None:
+            self.post.refresh_from_db()
+            self.assertEqual(self.post.comment_count, post)
+        if other is not None:
+            self.other.refresh_from_db()
+            self.assertEqual(self.other.comment_count, other)
+        for name, count in tags.items():
+            self.assertEqual(Tag.objects.get(name=name).post_count, count)
+
+    def test_comment_count(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='hi')
+        Comment.objects.create(post=self.post, author=self.user, content='hello')
+        self.assertCounts(post=2, other=0)
+
+        comment.post = self.other
+        comment.save()
+        self.assertCounts(post=1, other=1)
+
+        comment.delete()
+        self.assertCounts(post=1, other=0)
+
+    def test_comment_count_bulk_paths(self):
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, content=str(i)) for i in range(3)
+        ] + [Comment(post=self.other, author=self.user, content='x')])
+        self.assertCounts(post=3, other=1)
+
+        Comment.objects.filter(post=self.post).delete()
+        self.assertCounts(post=0, other=1)
+
+    def test_comment_count_bulk_ignore_conflicts(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='a', ingest_id=uuid.uuid4())
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, content='dup', ingest_id=comment.ingest_id),
+            Comment(post=self.post, author=self.user, content='b', ingest_id=uuid.uuid4()),
+        ], ignore_conflicts=True)
+        self.assertCounts(post=2, other=0)
+
+    def test_deferred_post_id(self):
+        for i in range(3):
+            Comment.objects.create(post=self.post, author=self.user, content=str(i))
+        with self.assertNumQueries(1):
+            comments = list(Comment.objects.only('content'))
+        self.assertEqual(len(comments), 3)
+
+        comment = Comment.objects.defer('post').get(content='0')
+        comment.post = self.other
+        comment.save()
+        self.assertCounts(post=2, other=1)
+
+    def test_tag_post_count(self):
+        python = Tag.objects.create(name='python')
+        django = Tag.objects.create(name='django')
+
+        self.post.tags.add(python, django)
+        self.post.tags.add(python)
+        self.other.tags.add(python)
+        self.assertCounts(python=2, django=1)
+
+        self.post.tags.remove(django, django)
+        self.other.tags.remove(django)
+        self.assertCounts(python=2, django=0)
+
+        python.posts.clear()
+        self.assertCounts(python=0)
+
+        django.posts.add(self.post, self.other)
+        self.post.tags.set([python])
+        self.assertCounts(python=1, django=1)
+
+        self.other.delete()
+        self.assertCounts(python=1, django=0)
+
+    def test_reconcile_counters(self):
+        tag = Tag.objects.create(name='python')
+        self.post.tags.add(tag)
+        Comment.objects.create(post=self.post, author=self.user, content='hi')
+        Post.objects.update(comment_count=7)
+        Tag.objects.update(post_count=0)
+
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertIn('Fixed 2 post comment counts and 1 tag post counts.', out.getvalue())
+        self.assertCounts(post=1, other=0, python=1)
+
+
+class TagSyncTestCase(TestCase):
+    """
+    Tests for the bulk tag sync used by PostForm.save.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+
+    def save_post(self, tags, instance=None):
+        form = PostForm(
+            data={'title': 'Tagged', 'content': '...', 'tags': tags},
+            instance=instance or Post(author=self.user),
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def tag_names(self, post):
+        return sorted(post.tags.values_list('name', flat=True))
+
+    def test_resolve_creates_missing_tags_once(self):
+        Tag.objects.create(name='python')
+        tags = Tag.objects.resolve(['python', 'django', 'python'])
+        self.assertEqual([tag.name for tag in tags], ['python', 'django'])
+        self.assertTrue(all(tag.pk for tag in tags))
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_resolve_tolerates_concurrent_insert(self):
+        # Simulate another request inserting the tag after our lookup.
+        existing = Tag.objects.create(name='django')
+        Tag.objects.bulk_create([Tag(name='django')], ignore_conflicts=True)
+        self.assertEqual(Tag.objects.resolve(['django']), [existing])
+
+    def test_save_syncs_only_the_difference(self):
+        post = self.save_post('Python, django, , web')
+        self.assertEqual(self.tag_names(post), ['django', 'python', 'web'])
+
+        through = Post.tags.through
+        kept = through.objects.get(post=post, tag__name='django').pk
+        post = self.save_post('django, orm', instance=post)
+        self.assertEqual(self.tag_names(post), ['django', 'orm'])
+        self.assertEqual(through.objects.get(post=post, tag__name='django').pk, kept)
+
+    def test_save_query_count_does_not_grow_with_tags(self):
+        post = self.save_post('a')
+        with CaptureQueriesContext(connection) as few:
+            self.save_post('b, c', instance=post)
+        names = ', '.join(f'tag{i}' for i in range(25))
+        with CaptureQueriesContext(connection) as many:
+            self.save_post(names, instance=post)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(post.tags.count(), 25)
+
+    def test_rejects_overlong_tag(self):
+        form = PostForm(data={'title': 'T', 'content': '...', 'tags': 'x' * 51})
+        self.assertFalse(form.is_valid())
+        self.assertIn('tags', form.errors)
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """
+    The blog's list and detail views stay within their query budgets as
+    the amount of data grows.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.tag = Tag.objects.create(name='django')
+
+    def add_posts(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'writer{Post.objects.count()}')
+            post = Post.objects.create(title=f'Django post {i}', content='word ' * 200, author=user)
+            post.tags.add(self.tag, Tag.objects.create(name=f'tag{post.pk}'))
+            Comment.objects.create(post=post, author=user, content='First!')
+        return post
+
+    def check_budgets(self):
+        post = Post.objects.first()
+        self.assertWithinQueryBudget('post-list')
+        self.assertWithinQueryBudget('posts-by-tag', self.tag.name)
+        self.assertWithinQueryBudget('search', data={'q': 'django'})
+        self.assertWithinQueryBudget('post-detail', post.pk)
+        self.assertWithinQueryBudget('post-comments', post.pk)
+
+    def test_budgets_hold_as_data_grows(self):
+        post = self.add_posts(2)
+        self.check_budgets()
+        for i in range(10):
+            Comment.objects.create(post=post, author=post.author, content=f'Reply {i}')
+        self.add_posts(15)
+        self.check_budgets()
+
+    def test_list_views_load_only_an_excerpt(self):
+        self.add_posts(1)
+        response = self.assertWithinQueryBudget('post-list')
+        post = response.context['posts'][0]
+        self.assertIn('content', post.get_deferred_fields())
+        self.assertContains(response, 'word word')
+
+
+class KeysetPaginationTestCase(TestCase):
+    """
+    Tests for cursor pagination of the blog listings.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='...', author=self.user)
+            for i in range(25)
+        ]
+        # Give groups of posts identical timestamps so ties fall back to pk.
+        now = timezone.now()
+        for i, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(
+                published_date=now - timezone.timedelta(minutes=i // 4)
+            )
+        self.expected = list(Post.objects.order_by('-published_date', '-pk'))
+
+    def walk(self, paginator):
+        page = paginator.page()
+        pages = [page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_pages_cover_every_post_once(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        pages = self.walk(paginator)
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual([post for page in pages for post in page], self.expected)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_previous_and_last(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        third = self.walk(paginator)[-1]
+        second = paginator.page(third.previous_cursor)
+        self.assertEqual(second.number, 2)
+        self.assertEqual(list(second), self.expected[10:20])
+        first = paginator.page(second.previous_cursor)
+        self.assertEqual(first.number, 1)
+        self.assertFalse(first.has_previous())
+
+        last = paginator.page(first.last_cursor)
+        self.assertEqual(last.number, 3)
+        self.assertEqual(list(last), self.expected[-10:])
+        self.assertFalse(last.has_next())
+
+    def test_count_is_cached(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 25)
+        Post.objects.create(title='New', content='...', author=self.user)
+        self.assertEqual(KeysetPaginator(Post.objects.all(), 10).count, 25)
+        self.assertEqual(KeysetPaginator(Post.objects.all(), 10, count_mode='exact').count, 26)
+
+    def test_list_view_uses_cursors(self):
+        response = self.client.get(reverse('post-list'))
+        page = response.context['page_obj']
+        self.assertEqual(list(response.context['posts']), self.expected[:10])
+        self.assertContains(response, f'cursor={page.next_cursor}')
+        self.assertContains(response, 'Page 1 of 3')
+
+        response = self.client.get(reverse('post-list'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['posts']), self.expected[10:20])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('search'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_tag_view_counts_from_stored_counter(self):
+        tag = Tag.objects.create(name='python')
+        tag.posts.add(*self.posts[:12])
+        response = self.client.get(reverse('posts-by-tag', args=['python']))
+        self.assertContains(response, 'Page 1 of 2')
+
+
+class FragmentCacheTestCase(TestCase):
+    """
+    Tests for the versioned post and comment fragments on the detail page.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.post = Post.objects.create(title='Cached', content='Body text', author=self.author)
+        self.other = Post.objects.create(title='Other', content='...', author=self.author)
+        self.comment = Comment.objects.create(post=self.post, author=self.reader, content='Nice post')
+        self.url = reverse('post-detail', args=[self.post.pk])
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, len(queries)
+
+    def test_hit_skips_tag_and_comment_queries(self):
+        _, misses = self.get()
+        response, hits = self.get()
+        self.assertEqual(hits, 1)
+        self.assertLess(hits, misses)
+        self.assertContains(response, 'Body text')
+        self.assertContains(response, 'Nice post')
+
+    def test_invalidated_by_post_tag_and_comment_changes(self):
+        version = post_version(self.post.pk)
+        other_version = post_version(self.other.pk)
+
+        Comment.objects.create(post=self.post, author=self.author, content='Thanks')
+        self.assertNotEqual(post_version(self.post.pk), version)
+        version = post_version(self.post.pk)
+
+        self.post.tags.add(Tag.objects.create(name='django'))
+        self.assertNotEqual(post_version(self.post.pk), version)
+        version = post_version(self.post.pk)
+
+        Tag.objects.filter(name='django').get().delete()
+        self.assertNotEqual(post_version(self.post.pk), version)
+        version = post_version(self.post.pk)
+
+        self.comment.content = 'Edited'
+        self.comment.save()
+        self.assertNotEqual(post_version(self.post.pk), version)
+        self.assertEqual(post_version(self.other.pk), other_version)
+
+    def test_page_reflects_changes(self):
+        self.get()
+        self.post.title = 'Renamed'
+        self.post.save()
+        Comment.objects.create(post=self.post, author=self.author, content='Second thoughts')
+        response, _ = self.get()
+        self.assertContains(response, 'Renamed')
+        self.assertContains(response, 'Second thoughts')
+
+    def test_edit_links_stay_per_user(self):
+        edit_comment = reverse('edit-comment', args=[self.comment.pk])
+        edit_post = reverse('post-update', args=[self.post.pk])
+
+        response, _ = self.get()
+        self.assertNotContains(response, edit_comment)
+        self.assertNotContains(response, 'comment-form')
+
+        self.client.login(username='reader', password='testpass123')
+        response, _ = self.get()
+        self.assertContains(response, edit_comment)
+        self.assertNotContains(response, edit_post)
+        self.assertContains(response, 'comment-form')
+
+        self.client.login(username='writer', password='testpass123')
+        response, _ = self.get()
+        self.assertNotContains(response, edit_comment)
+        self.assertContains(response, edit_post)
+
+
+class CommentPagingTestCase(TestCase):
+    """
+    Tests for paged comment threads and the "Load more" endpoint.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Popular', content='...', author=self.user)
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, content=f'Comment {i}')
+            for i in range(45)
+        ])
+        self.expected = list(Comment.objects.order_by('created_at', 'pk'))
+        self.url = reverse('post-comments', args=[self.post.pk])
+
+    def test_detail_renders_first_page_only(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(list(response.context['comment_page']), self.expected[:20])
+        self.assertContains(response, 'Comments (45)')
+        self.assertContains(response, 'load-more-comments')
+        self.assertNotContains(response, self.expected[20].content + '<')
+
+    def test_load_more_walks_every_comment(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        cursor = response.context['comment_page'].next_cursor
+        seen = list(response.context['comment_page'])
+        while cursor:
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, 'No comments yet')
+            seen += list(response.context['comment_page'])
+            cursor = response.context['comment_page'].next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_json_format(self):
+        data = self.client.get(self.url, {'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), 20)
+        self.assertEqual(data['comments'][0]['content'], 'Comment 0')
+        self.assertEqual(data['comments'][0]['author'], 'writer')
+        self.assertFalse(data['comments'][0]['can_edit'])
+
+        self.client.login(username='writer', password='testpass123')
+        data = self.client.get(self.url, {'format': 'json', 'cursor': data['next_cursor']}).json()
+        self.assertEqual(data['comments'][0]['content'], 'Comment 20')
+        self.assertTrue(data['comments'][0]['can_edit'])
+
+    def test_unknown_post_and_bad_cursor(self):
+        response = self.client.get(reverse('post-comments', args=[self.post.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(self.url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+
+class IndexAdvisorTestCase(TestCase):
+    """
+    The blog's querysets are served by indexes, not full scans or sorts.
+    """
+
+    def test_explain_queries_finds_no_problems(self):
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(title='Indexed', content='...', author=user)
+        post.tags.add(Tag.objects.create(name='django'))
+        out = StringIO()
+        call_command('explain_queries', fail=True, stdout=out)
+        self.assertIn('All queries use an index.', out.getvalue())
+
+    def test_popular_tag_path_returns_the_same_posts(self):
+        user = User.objects.create_user(username='writer')
+        tag = Tag.objects.create(name='django')
+        for i in range(5):
+            post = Post.objects.create(title=f'Post {i}', content='...', author=user)
+            if i % 2:
+                post.tags.add(tag)
+        tag.refresh_from_db()
+        small = list(views.tagged_posts(tag, scan_threshold=100))
+        popular = list(views.tagged_posts(tag, scan_threshold=1))
+        self.assertEqual(len(small), 2)
+        self.assertEqual(small, popular)
+
+
+def async_urlconf():
+    """blog.urls with the read-only routes swapped for their async versions."""
+    from . import async_views, urls
+
+    async_routes = {
+        'post-list': async_views.post_list,
+        'post-detail': async_views.post_detail,
+        'posts-by-tag': async_views.posts_by_tag,
+        'search': async_views.search_posts,
+    }
+    urlconf = ModuleType('blog_async_urls')
+    urlconf.urlpatterns = [
+        path(str(pattern.pattern), async_routes.get(pattern.name, pattern.callback), name=pattern.name)
+        for pattern in urls.urlpatterns
+    ]
+    return urlconf
+
+
+@override_settings(ROOT_URLCONF=async_urlconf())
+class AsyncViewTestCase(TestCase):
+    """
+    Tests for the async read path served under ASGI.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.tag = Tag.objects.create(name='django')
+        self.posts = []
+        for i in range(12):
+            post = Post.objects.create(title=f'Django post {i}', content='word ' * 80, author=self.user)
+            post.tags.add(self.tag)
+            self.posts.append(post)
+        self.comment = Comment.objects.create(post=self.posts[0], author=self.user, content='First!')
+
+    async def test_post_list(self):
+        response = await self.async_client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Django post 11')
+        self.assertContains(response, 'Page 1 of 2')
+        cursor = response.context['page_obj'].next_cursor
+        response = await self.async_client.get(reverse('post-list'), {'cursor': cursor})
+        self.assertContains(response, 'Django post 0')
+        response = await self.async_client.get(reverse('post-list'), {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_posts_by_tag(self):
+        response = await self.async_client.get(reverse('posts-by-tag', args=['django']))
+        self.assertContains(response, '12 posts')
+        self.assertEqual(len(response.context['posts']), 10)
+        response = await self.async_client.get(reverse('posts-by-tag', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_post_detail(self):
+        url = reverse('post-detail', args=[self.posts[0].pk])
+        edit_comment = reverse('edit-comment', args=[self.comment.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'First!')
+        self.assertNotContains(response, edit_comment)
+
+        await self.async_client.alogin(username='writer', password='testpass123')
+        response = await self.async_client.get(url)
+        self.assertContains(response, edit_comment)
+
+    async def test_search(self):
+        response = await self.async_client.get(reverse('search'), {'q': 'django'})
+        self.assertContains(response, '12 posts found')
+        self.assertTrue(response.context['page_obj'].has_next())
+
+    def test_asgi_keeps_sync_views_by_default(self):
+        # Only an explicit BLOG_ASYNC_VIEWS=1 switches the views over.
+        with patch.dict(os.environ):
+            os.environ.pop('BLOG_ASYNC_VIEWS', None)
+            importlib.reload(importlib.import_module('django_blog.asgi'))
+            self.assertIsNone(os.environ.get('BLOG_ASYNC_VIEWS'))
+
+
+class RequestMetricsTestCase(TestCase):
+    """
+    Tests for the per-request metrics middleware.
+    """
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Measured', content='Body', author=self.user)
+
+    def query_count(self, response):
+        db = response['Server-Timing'].split(', ')[0]
+        return int(db.split('desc="')[1].split(' ')[0])
+
+    def test_server_timing(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(self.query_count(response), len(queries))
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    async def test_async_handler(self):
+        # Queries run in a worker thread and still count.
+        response = await self.async_client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertGreater(self.query_count(response), 0)
+
+    def test_metrics_view(self):
+        self.client.get(reverse('post-list'))
+        self.client.get(reverse('post-list'))
+        self.assertEqual(self.client.get('/_metrics/').status_code, 403)
+
+        User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.login(username='staff', password='testpass123')
+        metrics = self.client.get('/_metrics/').json()['views']['post-list']
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(sum(metrics['total_ms']['buckets'].values()), 2)
+
+
+class CommentIngestTestCase(TestCase):
+    """
+    Tests for buffered comment ingestion (BLOG_COMMENT_BUFFER).
+    """
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+        buffer = override_settings(BLOG_COMMENT_BUFFER={'PATH': self.spool_dir, 'MAX_DELAY': 60, 'FSYNC': False})
+        buffer.enable()
+        self.addCleanup(buffer.disable)
+
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Live', content='...', author=self.user)
+        self.client.login(username='writer', password='testpass123')
+        self.url = reverse('add-comment', args=[self.post.pk])
+
+    def test_comments_are_spooled_until_flushed(self):
+        for i in range(3):
+            response = self.client.post(self.url, {'content': f'comment {i}'})
+            self.assertRedirects(response, reverse('post-detail', args=[self.post.pk]))
+        self.assertFalse(Comment.objects.exists())
+
+        with self.assertNumQueries(7):
+            # Three lookups, one insert and one counter update in a savepoint.
+            self.assertEqual(get_comment_spool().flush(), 3)
+        self.assertEqual(
+            list(Comment.objects.values_list('content', flat=True)),
+            ['comment 0', 'comment 1', 'comment 2'],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(get_comment_spool().flush(), 0)
+
+    def test_invalid_comment_is_not_spooled(self):
+        self.client.post(self.url, {'content': ''})
+        self.assertIsNone(get_comment_spool().pending_age())
+
+    def test_flush_when_delay_elapsed(self):
+        with self.settings(BLOG_COMMENT_BUFFER={'PATH': self.spool_dir, 'MAX_DELAY': 0, 'FSYNC': False}):
+            self.client.post(self.url, {'content': 'right away'})
+        self.assertTrue(Comment.objects.filter(content='right away').exists())
+
+    def test_batches_are_chunked(self):
+        spool = get_comment_spool()
+        spool.max_batch = 2
+        for i in range(5):
+            spool.append(self.post.pk, self.user.pk, str(i))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(spool.flush(), 5)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "blog_comment"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_replayed_batch_does_not_duplicate(self):
+        spool = get_comment_spool()
+        spool.append(self.post.pk, self.user.pk, 'once')
+        spool.append(self.post.pk, self.user.pk, 'twice')
+        with open(spool.spool_path) as f:
+            lines = f.read()
+        spool.flush()
+
+        # A crash after the insert but before the batch file was removed.
+        with open(os.path.join(self.spool_dir, 'batch-1.jsonl'), 'w') as f:
+            f.write(lines + '{"id": "torn')
+        self.assertEqual(spool.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(os.listdir(self.spool_dir), ['flush.lock'])
+
+    def test_comments_on_deleted_posts_are_dropped(self):
+        other = Post.objects.create(title='Gone', content='...', author=self.user)
+        spool = get_comment_spool()
+        spool.append(other.pk, self.user.pk, 'lost')
+        spool.append(self.post.pk, self.user.pk, 'kept')
+        other.delete()
+        self.assertEqual(spool.flush(), 1)
+        self.assertEqual(Comment.objects.get().content, 'kept')
+
+    def test_flush_comments_command(self):
+        get_comment_spool().append(self.post.pk, self.user.pk, 'queued')
+        out = StringIO()
+        call_command('flush_comments', stdout=out)
+        self.assertIn('Wrote 1 comments.', out.getvalue())
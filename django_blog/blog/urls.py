@@ -1,6 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if getattr(settings, 'BLOG_ASYNC_VIEWS', False):
+    from . import async_views
+
+    post_list = async_views.post_list
+    post_detail = async_views.post_detail
+    search_posts = async_views.search_posts
+    posts_by_tag = async_views.posts_by_tag
+else:
+    post_list = views.PostListView.as_view()
+    post_detail = views.PostDetailView.as_view()
+    search_posts = views.search_posts
+    posts_by_tag = views.PostByTagListView.as_view()
+
 urlpatterns = [
     # Authentication URLs
     path('register/', views.register, name='register'),
@@ -9,18 +23,19 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     
     # Blog Post URLs
-    path('', views.PostListView.as_view(), name='post-list'),
-    path('post/<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('', post_list, name='post-list'),
+    path('post/<int:pk>/', post_detail, name='post-detail'),
     path('post/new/', views.PostCreateView.as_view(), name='post-create'),
     path('post/<int:pk>/update/', views.PostUpdateView.as_view(), name='post-update'),
     path('post/<int:pk>/delete/', views.PostDeleteView.as_view(), name='post-delete'),
     
     # Comment URLs
+    path('post/<int:pk>/comments/', views.post_comments, name='post-comments'),
     path('post/<int:pk>/comment/', views.add_comment, name='add-comment'),
     path('comment/<int:pk>/edit/', views.edit_comment, name='edit-comment'),
     path('comment/<int:pk>/delete/', views.delete_comment, name='delete-comment'),
     
     # Search and Tag URLs
-    path('search/', views.search_posts, name='search'),
-    path('tags/<str:tag_name>/', views.PostByTagListView.as_view(), name='posts-by-tag'),
+    path('search/', search_posts, name='search'),
+    path('tags/<str:tag_name>/', posts_by_tag, name='posts-by-tag'),
 ]
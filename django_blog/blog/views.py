@@ -3,21 +3,31 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from .models import Post, Comment, Tag
 from .forms import CommentForm, PostForm
+from .fragments import get_fragment_cache_alias, get_fragment_timeout, post_version
+from .ingest import get_comment_spool
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import login, logout, authenticate
-from django.db.models import Q
+from urllib.parse import urlencode
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse
+from django.utils.functional import SimpleLazyObject
+from .pagination import InvalidCursor, KeysetPaginationMixin, KeysetPaginator
+from .search import get_search_backend
 
 # Blog Views
-class PostListView(ListView):
+class PostListView(KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     paginate_by = 10
     ordering = ['-published_date']
 
+    def get_queryset(self):
+        return super().get_queryset().for_listing()
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     form_class = PostForm  # Changed from fields
@@ -27,8 +37,6 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         form.instance.author = self.request.user
         messages.success(self.request, 'Post created successfully!')
         return super().form_valid(form)
-from django.db.models import Q
-
 class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Post
     form_class = PostForm  # Use a ModelForm if you created one
@@ -45,22 +53,31 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
 
 # Search view - separate function
-def search_posts(request):
-    query = request.GET.get('q', '')
+def search_paginator(query):
     posts = Post.objects.all()
+    ordering = ('-published_date', '-pk')
 
     if query:
-        posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
-    
-    context = {
-        'posts': posts,
-        'query': query
+        posts = get_search_backend().search(query)
+        ordering = ('-search_rank',) + ordering
+
+    return KeysetPaginator(posts.for_listing(), 10, ordering=ordering)
+
+
+def search_context(query, page_obj):
+    return {
+        'posts': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'query': query,
+        'extra_params': urlencode({'q': query}) if query else '',
     }
-    return render(request, 'blog/search_results.html', context)
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_paginator(query).get_page(request.GET.get('cursor'))
+    return render(request, 'blog/search_results.html', search_context(query, page_obj))
 
 class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Post
@@ -75,15 +92,29 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         messages.success(self.request, 'Post deleted successfully!')
         return super().delete(request, *args, **kwargs)
     
-class PostByTagListView(ListView):
+def tagged_posts(tag, scan_threshold):
+    if tag.post_count < scan_threshold:
+        return Post.objects.filter(tags=tag)
+    links = Post.tags.through.objects.filter(post_id=OuterRef('pk'), tag_id=tag.pk)
+    return Post.objects.filter(Exists(links))
+
+
+class PostByTagListView(KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/posts_by_tag.html'
     context_object_name = 'posts'
     paginate_by = 10
     
+    # Small tags are joined and sorted; popular ones walk the published_date
+    # index and stop after a page, which beats sorting thousands of rows.
+    tag_scan_threshold = 500
+    
     def get_queryset(self):
         self.tag = get_object_or_404(Tag, name=self.kwargs['tag_name'])
-        return Post.objects.filter(tags=self.tag).order_by('-published_date')
+        return tagged_posts(self.tag, self.tag_scan_threshold).for_listing().order_by('-published_date')
+
+    def get_paginator_count(self):
+        return self.tag.post_count
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -96,19 +127,92 @@ class PostDetailView(DetailView):
     template_name = 'blog/post_detail.html'
     context_object_name = 'post'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('author')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.all()
-        context['comment_form'] = CommentForm()
+        context.update(post_detail_context(
+            self.object, post_version(self.object.pk), self.get_comment_owner()
+        ))
         return context
 
+    def get_comment_owner(self):
+        # The comment thread is shared by everyone who has no comments on
+        # this post; commenters get their own copy with edit links.
+        user = self.request.user
+        if user.is_authenticated and self.object.comments.filter(author=user).exists():
+            return user.pk
+        return 0
+
+
+def post_detail_context(post, version, comment_owner):
+    # Tags and comments are only queried when their cached fragments miss.
+    return {
+        'comment_page': SimpleLazyObject(comment_paginator(post).page),
+        'comment_form': CommentForm(),
+        'post_version': version,
+        'fragment_cache': get_fragment_cache_alias(),
+        'fragment_timeout': get_fragment_timeout(),
+        'comment_owner': comment_owner,
+    }
+
 # Comment Views
+COMMENTS_PER_PAGE = 20
+
+
+def comment_paginator(post):
+    comments = Comment.objects.filter(post_id=post.pk).select_related('author')
+    return KeysetPaginator(
+        comments, COMMENTS_PER_PAGE,
+        ordering=('created_at', 'pk'),
+        count=post.comment_count,
+    )
+
+
+def post_comments(request, pk):
+    """
+    One page of a post's comments for "Load more", as an HTML fragment or,
+    with ?format=json, as JSON.
+    """
+    post = get_object_or_404(Post.objects.only('pk', 'comment_count'), pk=pk)
+    try:
+        page = comment_paginator(post).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+    comment_owner = request.user.pk if request.user.is_authenticated else 0
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'content': comment.content,
+                    'created_at': comment.created_at,
+                    'updated_at': comment.updated_at,
+                    'can_edit': comment.author_id == comment_owner,
+                }
+                for comment in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+
+    context = {'post': post, 'comment_page': page, 'comment_owner': comment_owner}
+    return render(request, 'blog/comment_list.html', context)
+
 @login_required
 def add_comment(request, pk):
     post = get_object_or_404(Post, pk=pk)
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
+            spool = get_comment_spool()
+            if spool is not None:
+                spool.append(post.pk, request.user.pk, form.cleaned_data['content'])
+                spool.flush_if_due()
+                messages.success(request, 'Comment received! It will appear shortly.')
+                return redirect('post-detail', pk=post.pk)
             comment = form.save(commit=False)
             comment.post = post
             comment.author = request.user
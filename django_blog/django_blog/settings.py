@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings include the other middleware.
+    'django_blog.request_metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +53,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Query counts and timings per request (see django_blog.request_metrics).
+REQUEST_METRICS = {
+    'SERVER_TIMING': True,
+}
+
 ROOT_URLCONF = 'django_blog.urls'
 
 TEMPLATES = [
@@ -129,4 +137,27 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 LOGIN_REDIRECT_URL = 'post-list'
 LOGIN_URL = 'login'
-LOGOUT_REDIRECT_URL = 'post-list'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'post-list'
+# Full-text search backend for blog.views.search_posts. Leave unset to pick
+# one from the database vendor (FTS5 on SQLite, tsvector on PostgreSQL).
+# BLOG_SEARCH_BACKEND = 'blog.search.SQLiteSearchBackend'
+
+# Cache alias and timeout (seconds) for the rendered post and comment
+# fragments on the post detail page.
+BLOG_FRAGMENT_CACHE = 'default'
+BLOG_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Spool new comments to disk and write them in batches (see blog.ingest).
+# Leave unset to save each comment as it is posted. Run
+# `manage.py flush_comments --loop` next to the web workers so that quiet
+# spools are still flushed within MAX_DELAY seconds.
+# BLOG_COMMENT_BUFFER = {
+#     'PATH': BASE_DIR / 'comment_spool',
+#     'MAX_BATCH': 500,
+#     'MAX_DELAY': 2,
+# }
+
+# Serve the read-only blog views (lists, detail, search) from blog.async_views.
+# Off unless BLOG_ASYNC_VIEWS=1 is set: benchmark_read_path measured the
+# async views at about half the throughput of the sync ones under ASGI.
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .request_metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('_metrics/', metrics_view, name='request-metrics'),
     path('', include('blog.urls')),
 ]
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Bytes on the wire and serialization CPU time of the API's wire formats.
+
+``FormatBenchmarkCommand`` is the body of each project's
+``benchmark_formats`` management command. It creates a throwaway in-memory
+test database, asks the subclass for the serialized book list with
+``book_data()``, then prints the size of that list as JSON and as
+MessagePack, uncompressed and with every content encoding, next to the CPU
+time spent rendering and compressing it.
+
+This is the only copy of the module. Both API projects link to it from
+their settings package, next to wire_formats (see shared/README.md).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from .wire_formats import MessagePackRenderer, compress, unpackb
+
+ENCODINGS = ['identity', 'gzip', 'deflate']
+
+
+class FormatBenchmarkCommand(BaseCommand):
+    help = (
+        'Compare bytes on the wire and serialization CPU time of the JSON and '
+        'MessagePack renderers, uncompressed and with every content encoding, '
+        'for a list of books on a throwaway in-memory test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--level', type=int, default=6, help='zlib compression level.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best one counts.')
+
+    def book_data(self, options):
+        """Seed the test database and return the serialized book list."""
+        raise NotImplementedError('Subclasses of FormatBenchmarkCommand must provide book_data().')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            data = self.book_data(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        level, repeat = options['level'], options['repeat']
+        self.stdout.write(f'{len(data)} books')
+        self.stdout.write(f'{"format":<8} {"encoding":<9} {"bytes":>10} {"vs json":>8} {"render ms":>10} {"encode ms":>10}')
+        json_size = None
+        for renderer in (JSONRenderer(), MessagePackRenderer()):
+            body = renderer.render(data)
+            if renderer.format == 'msgpack' and unpackb(body) != data:
+                raise CommandError('MessagePack does not round-trip the book list.')
+            render_ms = self.best_of(lambda: renderer.render(data), repeat) * 1000
+            for encoding in ENCODINGS:
+                if encoding == 'identity':
+                    size, encode_ms = len(body), 0.0
+                else:
+                    size = len(compress(body, encoding, level))
+                    encode_ms = self.best_of(lambda: compress(body, encoding, level), repeat) * 1000
+                json_size = json_size or size
+                self.stdout.write(
+                    f'{renderer.format:<8} {encoding:<9} {size:>10} {size / json_size:>8.2f} '
+                    f'{render_ms:>10.2f} {encode_ms:>10.2f}'
+                )
+
+    def best_of(self, func, repeat):
+        # CPU time, not wall time: the cost to the worker, not to the client.
+        timings = []
+        for _ in range(repeat):
+            started = time.process_time()
+            func()
+            timings.append(time.process_time() - started)
+        return min(timings)
@@ -0,0 +1,245 @@
+"""
+Per-request query and timing instrumentation.
+
+``RequestMetricsMiddleware`` records, for every request, the number of SQL
+queries, the time spent in them, how many of them repeat an earlier
+statement of the same request (the usual sign of an N+1 loop), the time
+spent rendering deferred responses (TemplateResponse and DRF's Response)
+and the total time. Each response carries them in a ``Server-Timing``
+header, which browser dev tools display next to the request.
+
+The numbers are also added to per-view histograms kept in this process,
+served as JSON by ``metrics_view`` to staff users (anyone while DEBUG is
+on). Every worker process keeps its own, so the endpoint reports the pid.
+
+Queries are counted by a wrapper installed on every database connection
+as it is opened, which finds the current request through a ContextVar. It
+costs two clock reads per query and does nothing outside requests, so the
+middleware can stay on in production. Put it first in MIDDLEWARE so the
+total includes the other middleware.
+
+This is the only copy of the module. Each project's settings package links
+to it (``<project>/<settings package>/request_metrics.py`` is a symlink to
+``shared/request_metrics.py``), so a fix here reaches every project.
+
+Settings, all optional::
+
+    REQUEST_METRICS = {
+        'SERVER_TIMING': True,   # add the Server-Timing header
+    }
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+
+DEFAULTS = {
+    'SERVER_TIMING': True,
+}
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded.
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time', 'statements', 'duplicates', 'render_started', 'render_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = set()
+        self.duplicates = 0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        if sql in self.statements:
+            self.duplicates += 1
+        else:
+            self.statements.add(sql)
+
+    def rendered(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+def _install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """Count the queries of every connection, including ones already open."""
+    connection_created.connect(_install, dispatch_uid='request_metrics')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        labels = [f'le_{bound}' for bound in self.bounds] + ['inf']
+        return {'sum': round(self.sum, 3), 'buckets': dict(zip(labels, self.counts))}
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duplicate_queries = 0
+        self.total_ms = Histogram(MS_BUCKETS)
+        self.db_ms = Histogram(MS_BUCKETS)
+        self.render_ms = Histogram(MS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'duplicate_queries': self.duplicate_queries,
+            'total_ms': self.total_ms.snapshot(),
+            'db_ms': self.db_ms.snapshot(),
+            'render_ms': self.render_ms.snapshot(),
+            'queries': self.queries.snapshot(),
+        }
+
+
+class MetricsRegistry:
+    """Per-view aggregates for this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.since = time.time()
+
+    def observe(self, view, status, total_ms, db_ms, render_ms, queries, duplicates):
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            metrics.requests += 1
+            metrics.errors += status >= 500
+            metrics.duplicate_queries += duplicates
+            metrics.total_ms.observe(total_ms)
+            metrics.db_ms.observe(db_ms)
+            metrics.render_ms.observe(render_ms)
+            metrics.queries.observe(queries)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'since': self.since,
+                'views': {name: metrics.snapshot() for name, metrics in sorted(self.views.items())},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.since = time.time()
+
+
+registry = MetricsRegistry()
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = get_options()['SERVER_TIMING']
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_query_recorder()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def process_template_response(self, request, response):
+        # The view is done and the response is about to be rendered.
+        stats = _current.get()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(stats.rendered)
+        return response
+
+    def finish(self, request, response, stats):
+        ended = time.perf_counter()
+        total_ms = (ended - stats.started) * 1000
+        db_ms = stats.db_time * 1000
+        render_ms = stats.render_time * 1000
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else '<unresolved>'
+        registry.observe(view, response.status_code, total_ms, db_ms, render_ms, stats.queries, stats.duplicates)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{stats.queries} queries, {stats.duplicates} duplicate", '
+                f'render;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+            )
+        return response
+
+
+def metrics_view(request):
+    """The per-view aggregates as JSON; POST with ``reset=1`` clears them."""
+    user = getattr(request, 'user', None)
+    if not settings.DEBUG and not (user and user.is_staff):
+        raise PermissionDenied
+    if request.method == 'POST' and request.POST.get('reset'):
+        registry.reset()
+    return JsonResponse(registry.snapshot())
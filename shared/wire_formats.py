@@ -0,0 +1,379 @@
+"""
+The wire formats of the API: MessagePack bodies and compressed responses.
+
+``MessagePackRenderer`` answers ``Accept: application/msgpack`` (or
+``?format=msgpack``) with the same data the JSON renderer produces, in the
+MessagePack binary format (https://msgpack.org). Lists of books come out
+smaller than the JSON, since numbers, nulls and booleans take one to nine
+bytes and strings are not quoted or escaped. Values JSON cannot hold
+natively, like dates and UUIDs, go through DRF's JSONEncoder first, so both
+formats carry the same strings.
+
+``packb()`` writes the smallest encoding of every value; ``unpackb()``
+reads any MessagePack document without extension types. Neither needs the
+``msgpack`` package.
+
+``CompressionMiddleware`` compresses a response with gzip or deflate (zlib)
+when the client accepts one of them, its content type is one of
+``CONTENT_TYPES`` and its body is at least ``MIN_LENGTH`` bytes long.
+Streaming responses, like the exports, are compressed chunk by chunk and
+flushed after every chunk, so consumers still get rows as they are
+produced. Brotli and zstd have no implementation in this Python's standard
+library, so they are not offered.
+
+Nothing is compressed unless RESPONSE_COMPRESSION is set::
+
+    RESPONSE_COMPRESSION = {
+        'ENCODINGS': ['gzip', 'deflate'],  # preferred first, on equal q-values
+        'LEVEL': 6,                        # zlib level, 1 (fastest) to 9 (smallest)
+        'MIN_LENGTH': 1024,                # smaller bodies are sent as they are
+        'CONTENT_TYPES': ['application/json', 'application/x-ndjson', 'application/msgpack'],
+    }
+
+HTML is left out of the default content types on purpose: a compressed
+page that reflects user input next to a secret, like a CSRF token, is open
+to BREACH.
+
+This is the only copy of the module. Both API projects link to it from
+their settings package (``<settings package>/wire_formats.py`` is a symlink
+to ``shared/wire_formats.py``), as with request_metrics.
+"""
+import re
+import struct
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+MESSAGEPACK_MEDIA_TYPE = 'application/msgpack'
+
+_json_default = JSONEncoder().default
+
+
+def _pack_int(value, out):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -32 <= value < 0:
+        out.append(value & 0xff)
+    elif value >= 0:
+        if value <= 0xff:
+            out += b'\xcc' + struct.pack('>B', value)
+        elif value <= 0xffff:
+            out += b'\xcd' + struct.pack('>H', value)
+        elif value <= 0xffffffff:
+            out += b'\xce' + struct.pack('>I', value)
+        elif value <= 0xffffffffffffffff:
+            out += b'\xcf' + struct.pack('>Q', value)
+        else:
+            raise ValueError(f'{value} is too large for MessagePack.')
+    elif value >= -0x80:
+        out += b'\xd0' + struct.pack('>b', value)
+    elif value >= -0x8000:
+        out += b'\xd1' + struct.pack('>h', value)
+    elif value >= -0x80000000:
+        out += b'\xd2' + struct.pack('>i', value)
+    elif value >= -0x8000000000000000:
+        out += b'\xd3' + struct.pack('>q', value)
+    else:
+        raise ValueError(f'{value} is too small for MessagePack.')
+
+
+def _pack_str(value, out):
+    data = value.encode('utf-8')
+    size = len(data)
+    if size < 32:
+        out.append(0xa0 | size)
+    elif size <= 0xff:
+        out += b'\xd9' + struct.pack('>B', size)
+    elif size <= 0xffff:
+        out += b'\xda' + struct.pack('>H', size)
+    else:
+        out += b'\xdb' + struct.pack('>I', size)
+    out += data
+
+
+def _pack_bin(value, out):
+    size = len(value)
+    if size <= 0xff:
+        out += b'\xc4' + struct.pack('>B', size)
+    elif size <= 0xffff:
+        out += b'\xc5' + struct.pack('>H', size)
+    else:
+        out += b'\xc6' + struct.pack('>I', size)
+    out += value
+
+
+def _pack_header(size, fix, codes, out):
+    if size < 16:
+        out.append(fix | size)
+    elif size <= 0xffff:
+        out += codes[0] + struct.pack('>H', size)
+    else:
+        out += codes[1] + struct.pack('>I', size)
+
+
+def _pack(value, out):
+    # Exact type checks first: they are the common case and the cheapest.
+    kind = type(value)
+    if kind is str:
+        _pack_str(value, out)
+    elif kind is int:
+        _pack_int(value, out)
+    elif value is None:
+        out.append(0xc0)
+    elif kind is bool:
+        out.append(0xc3 if value else 0xc2)
+    elif kind is float:
+        out += b'\xcb' + struct.pack('>d', value)
+    elif isinstance(value, dict):
+        _pack_header(len(value), 0x80, (b'\xde', b'\xdf'), out)
+        for key, item in value.items():
+            _pack(key, out)
+            _pack(item, out)
+    elif isinstance(value, (list, tuple)):
+        _pack_header(len(value), 0x90, (b'\xdc', b'\xdd'), out)
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, str):
+        _pack_str(value, out)
+    elif isinstance(value, bool):
+        out.append(0xc3 if value else 0xc2)
+    elif isinstance(value, int):
+        _pack_int(int(value), out)
+    elif isinstance(value, float):
+        out += b'\xcb' + struct.pack('>d', value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        _pack_bin(bytes(value), out)
+    else:
+        # Raises TypeError for values JSON could not render either.
+        _pack(_json_default(value), out)
+
+
+def packb(value):
+    """Encode ``value`` as MessagePack bytes."""
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def take(self, size):
+        start = self.pos
+        self.pos = end = start + size
+        if end > len(self.data):
+            raise ValueError('Truncated MessagePack data.')
+        return self.data[start:end]
+
+    def unpack(self, fmt, size):
+        return struct.unpack(fmt, self.take(size))[0]
+
+
+# Fixed-size formats: first byte -> (struct format, size).
+_NUMBERS = {
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+}
+# Formats with a length: first byte -> (kind, struct format, size of the length).
+_SIZED = {
+    0xc4: ('bin', '>B', 1), 0xc5: ('bin', '>H', 2), 0xc6: ('bin', '>I', 4),
+    0xd9: ('str', '>B', 1), 0xda: ('str', '>H', 2), 0xdb: ('str', '>I', 4),
+    0xdc: ('array', '>H', 2), 0xdd: ('array', '>I', 4),
+    0xde: ('map', '>H', 2), 0xdf: ('map', '>I', 4),
+}
+_CONSTANTS = {0xc0: None, 0xc2: False, 0xc3: True}
+
+
+def _unpack(reader):
+    code = reader.take(1)[0]
+    if code < 0x80:
+        return code
+    if code >= 0xe0:
+        return code - 0x100
+    if code <= 0x8f:
+        kind, size = 'map', code & 0x0f
+    elif code <= 0x9f:
+        kind, size = 'array', code & 0x0f
+    elif code <= 0xbf:
+        kind, size = 'str', code & 0x1f
+    elif code in _CONSTANTS:
+        return _CONSTANTS[code]
+    elif code in _NUMBERS:
+        return reader.unpack(*_NUMBERS[code])
+    elif code in _SIZED:
+        kind, fmt, length = _SIZED[code]
+        size = reader.unpack(fmt, length)
+    else:
+        raise ValueError(f'Unsupported MessagePack type 0x{code:02x}.')
+
+    if kind == 'str':
+        return str(reader.take(size), 'utf-8')
+    if kind == 'bin':
+        return bytes(reader.take(size))
+    if kind == 'array':
+        return [_unpack(reader) for _ in range(size)]
+    result = {}
+    for _ in range(size):
+        key = _unpack(reader)
+        result[key] = _unpack(reader)
+    return result
+
+
+def unpackb(data):
+    """Decode one MessagePack document; trailing bytes are an error."""
+    reader = _Reader(memoryview(data))
+    value = _unpack(reader)
+    if reader.pos != len(data):
+        raise ValueError('Extra data after the MessagePack document.')
+    return value
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders response data as MessagePack."""
+    media_type = MESSAGEPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
+
+
+DEFAULTS = {
+    'ENCODINGS': ['gzip', 'deflate'],
+    'LEVEL': 6,
+    'MIN_LENGTH': 1024,
+    'CONTENT_TYPES': ['application/json', 'application/x-ndjson', 'application/msgpack'],
+}
+
+# zlib window bits for a gzip wrapper, and for the zlib format HTTP calls deflate.
+WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+Q_RE = re.compile(r'(?:^|;)\s*q\s*=\s*([0-9.]+)')
+
+
+def get_options():
+    """The merged RESPONSE_COMPRESSION options, or None when it is off."""
+    options = getattr(settings, 'RESPONSE_COMPRESSION', None)
+    return {**DEFAULTS, **options} if options else None
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q-value}`` for an Accept-Encoding header."""
+    qualities = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        match = Q_RE.search(params)
+        try:
+            qualities[coding] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            qualities[coding] = 0.0
+    return qualities
+
+
+def choose_encoding(header, encodings):
+    """The one of ``encodings`` the client rates highest, or None."""
+    qualities = parse_accept_encoding(header)
+    default = qualities.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = qualities.get(encoding, default)
+        if q > best_q:
+            best, best_q = encoding, q
+    if best is not None and qualities.get('identity', 0.0) > best_q:
+        return None
+    return best
+
+
+def compressor(encoding, level):
+    return zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+
+
+def compress(content, encoding, level=6):
+    stream = compressor(encoding, level)
+    return stream.compress(content) + stream.flush()
+
+
+def compress_stream(chunks, encoding, level=6):
+    stream = compressor(encoding, level)
+    for chunk in chunks:
+        data = stream.compress(chunk) + stream.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield stream.flush()
+
+
+async def acompress_stream(chunks, encoding, level=6):
+    stream = compressor(encoding, level)
+    async for chunk in chunks:
+        data = stream.compress(chunk) + stream.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield stream.flush()
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        options = get_options()
+        if options is None or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+        if content_type not in options['CONTENT_TYPES']:
+            return response
+        # The body depends on Accept-Encoding from here on, even when it
+        # ends up uncompressed.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), options['ENCODINGS'])
+        if encoding is None:
+            return response
+
+        level = options['LEVEL']
+        if response.streaming:
+            stream = acompress_stream if response.is_async else compress_stream
+            response.streaming_content = stream(response.streaming_content, encoding, level)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < options['MIN_LENGTH']:
+                return response
+            compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag promises identical bytes, which no longer holds.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response